@@ -0,0 +1,31 @@
+"""Add content hash to document
+
+Revision ID: 3f6b8d2e4a15
+Revises: e5a0f7c3b912
+Create Date: 2026-03-08 13:27:05.662381
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3f6b8d2e4a15"
+down_revision: Union[str, Sequence[str], None] = "e5a0f7c3b912"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("document", sa.Column("content_hash", sa.String(length=64), nullable=True))
+    op.create_index(op.f("ix_document_content_hash"), "document", ["content_hash"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_document_content_hash"), table_name="document")
+    op.drop_column("document", "content_hash")
@@ -0,0 +1,86 @@
+"""Replace analysis tables with study cache
+
+Revision ID: 6e2b9f14c8d0
+Revises: a8c47e15d6b2
+Create Date: 2026-03-09 11:18:40.527301
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "6e2b9f14c8d0"
+down_revision: Union[str, Sequence[str], None] = "a8c47e15d6b2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "study_cache",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("project_id", sa.Integer(), nullable=False),
+        sa.Column("cache_key", sa.String(length=64), nullable=False),
+        sa.Column("field", sa.String(length=50), nullable=False),
+        sa.Column("document_ids", postgresql.ARRAY(sa.Integer()), nullable=False),
+        sa.Column("is_full_project", sa.Boolean(), nullable=False),
+        sa.Column("content", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False),
+        sa.ForeignKeyConstraint(["project_id"], ["projects.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("project_id", "cache_key", name="uq_study_cache_project_key"),
+    )
+    op.create_index(
+        "ix_study_cache_document_ids",
+        "study_cache",
+        ["document_ids"],
+        unique=False,
+        postgresql_using="gin",
+    )
+
+    # старі таблиці - лише кеш з ключами, що не враховували вміст; переносити нічого
+    op.drop_index(
+        op.f("ix_project_analysis_item_documents_hash"), table_name="project_analysis_item"
+    )
+    op.drop_table("project_analysis_item")
+    op.drop_table("project_analysis")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_table(
+        "project_analysis",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("project_id", sa.Integer(), nullable=False),
+        sa.Column("summary", sa.Text(), nullable=True),
+        sa.Column("key_points", sa.Text(), nullable=True),
+        sa.Column("exam_questions", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.ForeignKeyConstraint(["project_id"], ["projects.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "project_analysis_item",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("project_id", sa.Integer(), nullable=False),
+        sa.Column("documents_hash", sa.String(length=255), nullable=False),
+        sa.Column("summary", sa.Text(), nullable=True),
+        sa.Column("key_points", sa.Text(), nullable=True),
+        sa.Column("exam_questions", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.ForeignKeyConstraint(["project_id"], ["projects.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_project_analysis_item_documents_hash"),
+        "project_analysis_item",
+        ["documents_hash"],
+        unique=False,
+    )
+
+    op.drop_index("ix_study_cache_document_ids", table_name="study_cache", postgresql_using="gin")
+    op.drop_table("study_cache")
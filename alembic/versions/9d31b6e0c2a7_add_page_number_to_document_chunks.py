@@ -0,0 +1,29 @@
+"""Add page number to document chunks
+
+Revision ID: 9d31b6e0c2a7
+Revises: 4c9e2d7a1f03
+Create Date: 2026-03-04 18:02:13.540719
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9d31b6e0c2a7"
+down_revision: Union[str, Sequence[str], None] = "4c9e2d7a1f03"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("document_chunks", sa.Column("page_number", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("document_chunks", "page_number")
@@ -0,0 +1,37 @@
+"""Add progress and result to jobs
+
+Revision ID: b7d3e8a05c21
+Revises: 6e2b9f14c8d0
+Create Date: 2026-03-10 09:31:12.604418
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b7d3e8a05c21"
+down_revision: Union[str, Sequence[str], None] = "6e2b9f14c8d0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("jobs", sa.Column("progress", sa.Integer(), server_default="0", nullable=False))
+    op.add_column("jobs", sa.Column("message", sa.String(length=255), nullable=True))
+    op.add_column(
+        "jobs",
+        sa.Column("result", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("jobs", "result")
+    op.drop_column("jobs", "message")
+    op.drop_column("jobs", "progress")
@@ -0,0 +1,50 @@
+"""Add answer cache columns to chat history
+
+Revision ID: c3e9a1d47f20
+Revises: b7d3e8a05c21
+Create Date: 2026-03-11 14:02:37.518903
+
+"""
+
+from typing import Sequence, Union
+
+import pgvector.sqlalchemy
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c3e9a1d47f20"
+down_revision: Union[str, Sequence[str], None] = "b7d3e8a05c21"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "chat_history",
+        sa.Column("sources", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    )
+    op.add_column(
+        "chat_history",
+        sa.Column("question_embedding", pgvector.sqlalchemy.vector.VECTOR(dim=768), nullable=True),
+    )
+    op.add_column(
+        "chat_history", sa.Column("documents_version", sa.String(length=64), nullable=True)
+    )
+    op.create_index(
+        "ix_chat_history_project_version",
+        "chat_history",
+        ["project_id", "documents_version"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_chat_history_project_version", table_name="chat_history")
+    op.drop_column("chat_history", "documents_version")
+    op.drop_column("chat_history", "question_embedding")
+    op.drop_column("chat_history", "sources")
@@ -0,0 +1,45 @@
+"""Add query embedding cache table
+
+Revision ID: f1b6c4d92e37
+Revises: c3e9a1d47f20
+Create Date: 2026-03-12 09:21:14.640257
+
+"""
+
+from typing import Sequence, Union
+
+import pgvector.sqlalchemy
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f1b6c4d92e37"
+down_revision: Union[str, Sequence[str], None] = "c3e9a1d47f20"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "query_embedding_cache",
+        sa.Column("query_hash", sa.String(length=64), nullable=False),
+        sa.Column("model", sa.String(length=100), nullable=False),
+        sa.Column("dimensionality", sa.Integer(), nullable=False),
+        sa.Column("embedding", pgvector.sqlalchemy.vector.VECTOR(dim=768), nullable=False),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("query_hash"),
+    )
+    op.create_index(
+        op.f("ix_query_embedding_cache_created_at"),
+        "query_embedding_cache",
+        ["created_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_query_embedding_cache_created_at"), table_name="query_embedding_cache")
+    op.drop_table("query_embedding_cache")
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -9,6 +9,7 @@ from app.crud import project as crud_project
 from app.models.user import User
 from app.schemas.chat import ChatHistoryResponse, ChatRequest, ChatResponse
 from app.services.chat_service import chat_service
+from app.utils.streaming import cancel_on_disconnect
 
 router = APIRouter(prefix="/projects/{project_id}/chat", tags=["Chat"])
 
@@ -17,6 +18,7 @@ router = APIRouter(prefix="/projects/{project_id}/chat", tags=["Chat"])
 async def ask_question(
     project_id: int,
     request: ChatRequest,
+    http_request: Request,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
@@ -26,9 +28,13 @@ async def ask_question(
 
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
+    # сесія запиту живе до кінця відповіді - віддаємо з'єднання в пул до стріму
+    await db.close()
 
     return StreamingResponse(
-        chat_service.stream_chat(db, project_id, current_user.id, request.query),
+        cancel_on_disconnect(
+            http_request, chat_service.stream_chat(project_id, current_user.id, request.query)
+        ),
         media_type="text/event-stream",
     )
 
@@ -1,6 +1,7 @@
+from pathlib import Path
+
 from fastapi import (
     APIRouter,
-    BackgroundTasks,
     Depends,
     File,
     HTTPException,
@@ -13,13 +14,15 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_current_user
 from app.core.db import get_db
+from app.crud import chat as crud_chat
 from app.crud import document as crud_document
+from app.crud import job as crud_job
 from app.crud import project as crud_project
+from app.crud import study_cache as crud_study_cache
 from app.models.document import Document
 from app.models.user import User
 from app.schemas.document import DocumentCreate, DocumentResponse
-from app.services.rag_service import rag_service
-from app.utils.file_storage import delete_file, save_upload_file
+from app.utils.file_storage import UploadLimitError, delete_file, save_upload_file
 
 router = APIRouter(prefix="/projects/{project_id}/documents", tags=["Documents"])
 
@@ -28,7 +31,6 @@ router = APIRouter(prefix="/projects/{project_id}/documents", tags=["Documents"]
 
 @router.post("/", response_model=DocumentResponse, status_code=status.HTTP_201_CREATED)
 async def upload_document(
-    background_tasks: BackgroundTasks,
     project_id: int,
     file: UploadFile = File(...),
     db: AsyncSession = Depends(get_db),
@@ -57,11 +59,21 @@ async def upload_document(
             detail=f"File '{file.filename}' already exists. Please delete it first.",
         )
     try:
-        file_path = save_upload_file(file)
+        file_path, content_hash = await save_upload_file(file)
 
+    except UploadLimitError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e)
+        ) from e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}") from e
 
+    # той самий вміст уже є (в будь-якому проекті) - ділимо один файл на диску
+    duplicate = await crud_document.get_by_content_hash(db, content_hash)
+    if duplicate and Path(duplicate.file_path).is_file():
+        delete_file(file_path)
+        file_path = duplicate.file_path
+
     doc_in = DocumentCreate(filename=file.filename)
 
     document = await crud_document.create(
@@ -69,8 +81,12 @@ async def upload_document(
         obj_in=doc_in,
         file_path=file_path,
         project_id=project_id,
+        content_hash=content_hash,
     )
-    background_tasks.add_task(rag_service.process_document, document.id)
+    # склад документів проекту змінився - результати "по всьому проекту" застаріли
+    await crud_study_cache.invalidate_for_document(db, project_id, document.id)
+    # обробку виконує окремий воркер (app/worker.py), а не event loop API
+    await crud_job.enqueue(db, "process_document", {"document_id": document.id})
     return document
 
 
@@ -134,8 +150,12 @@ async def delete_document(
     if not document:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
 
-    delete_file(document.file_path)
+    # файл може бути спільним для кількох документів з однаковим вмістом
+    if await crud_document.count_file_references(db, document.file_path) <= 1:
+        delete_file(document.file_path)
 
     await crud_document.delete(db=db, db_obj=document)
+    await crud_study_cache.invalidate_for_document(db, project_id, document_id)
+    await crud_chat.invalidate_answer_cache(db, project_id)
 
     return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,9 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_current_user
-from app.core.db import get_db
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal, get_db
+from app.crud import job as crud_job
 from app.crud import project as crud_project
+from app.models.job import Job
 from app.models.user import User
 from app.schemas.study import (
     BaseStudyRequest,
@@ -11,6 +18,8 @@ from app.schemas.study import (
     ExamResponse,
     KeyPointsResponse,
     StudyContentResponse,
+    StudyJobRequest,
+    StudyJobResponse,
     UserQuestionsRequest,
     UserQuestionsResponse,
 )
@@ -27,6 +36,25 @@ async def check_project(db: AsyncSession, user_id: int, project_id: int):
     return project
 
 
+async def get_study_job(db: AsyncSession, project_id: int, job_id: int) -> Job:
+    job = await crud_job.get(db, job_id)
+    if not job or job.kind != "study" or job.payload.get("project_id") != project_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+def to_job_response(job: Job) -> StudyJobResponse:
+    # деталі помилки лишаються в логах воркера
+    return StudyJobResponse(
+        id=job.id,
+        status=job.status,
+        progress=job.progress,
+        message=job.message,
+        result=job.result if job.status == "done" else None,
+        error="Generation failed" if job.status == "failed" else None,
+    )
+
+
 @router.post("/summary", response_model=StudyContentResponse)
 async def get_summary(
     project_id: int,
@@ -82,3 +110,73 @@ async def answer_questions(
         questions=request.questions,
         document_ids=request.document_ids,
     )
+
+
+# --- Фонові задачі: POST повертає id одразу, генерує воркер (app/worker.py) ---
+
+
+@router.post("/jobs", response_model=StudyJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_study_job(
+    project_id: int,
+    request: StudyJobRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    await check_project(db, current_user.id, project_id)
+    if request.tool == "answer_questions" and not request.questions:
+        raise HTTPException(status_code=422, detail="questions are required for answer_questions")
+
+    payload = {"project_id": project_id, **request.model_dump()}
+    job = await crud_job.enqueue(db, "study", payload, max_attempts=settings.STUDY_JOB_MAX_ATTEMPTS)
+    return to_job_response(job)
+
+
+@router.get("/jobs/{job_id}", response_model=StudyJobResponse)
+async def get_study_job_status(
+    project_id: int,
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    await check_project(db, current_user.id, project_id)
+    return to_job_response(await get_study_job(db, project_id, job_id))
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_study_job(
+    project_id: int,
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """SSE у форматі чату: progress-події при зміні, наприкінці result або error"""
+    await check_project(db, current_user.id, project_id)
+    await get_study_job(db, project_id, job_id)
+    # з'єднання не тримаємо весь час генерації - кожне опитування бере своє
+    await db.close()
+
+    async def events():
+        last = None
+        while True:
+            async with AsyncSessionLocal() as poll_db:
+                job = await crud_job.get(poll_db, job_id)
+            if job is None:
+                yield f"data: {json.dumps({'error': 'Job not found'})}\n\n"
+                return
+
+            response = to_job_response(job)
+            if job.status == "done":
+                yield f"data: {json.dumps({'type': 'result', 'data': response.result})}\n\n"
+                return
+            if job.status == "failed":
+                yield f"data: {json.dumps({'error': response.error})}\n\n"
+                return
+
+            state = (response.status, response.progress, response.message)
+            if state != last:
+                last = state
+                data = response.model_dump(include={"status", "progress", "message"})
+                yield f"data: {json.dumps({'type': 'progress', 'data': data})}\n\n"
+            await asyncio.sleep(settings.STUDY_JOB_POLL_INTERVAL)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
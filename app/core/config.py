@@ -12,6 +12,102 @@ class Settings(BaseSettings):
     GEMINI_API_KEY: str
 
     GEMINI_MODEL: str = "gemini-2.5-flash-lite"
+    GEMINI_REWRITE_MODEL: str = "gemini-2.5-flash-lite"  # переформулювання питання в чаті
+
+    # Шлюз до Gemini (app/services/llm_gateway.py)
+    LLM_GENERATE_TIMEOUT: float = 60.0  # секунд на одну спробу generate / generate_json
+    LLM_STREAM_IDLE_TIMEOUT: float = 30.0  # максимум між двома шматками стріму
+    LLM_EMBED_TIMEOUT: float = 30.0
+    LLM_MAX_ATTEMPTS: int = 4
+    LLM_RETRY_BASE_DELAY: float = 1.0
+    LLM_RETRY_MAX_DELAY: float = 20.0
+    LLM_MAX_CONCURRENCY: int = 16  # одночасних запитів на одну модель
+    # Смуги планувальника (app/services/llm_scheduler.py), пріоритет: chat > study > ingestion.
+    # У .env задаються JSON-ом; бюджет токенів 0 - без ліміту
+    LLM_LANE_CONCURRENCY: dict[str, int] = {"chat": 16, "study": 4, "ingestion": 8}
+    LLM_LANE_TOKENS_PER_MINUTE: dict[str, int] = {"chat": 0, "study": 0, "ingestion": 0}
+    LLM_BREAKER_THRESHOLD: int = 5  # помилок поспіль, після яких модель "вимикається"
+    LLM_BREAKER_RESET_SECONDS: float = 30.0
+
+    EMBEDDING_MODEL: str = "gemini-embedding-001"
+    EMBEDDING_DIM: int = 768
+    EMBED_BATCH_SIZE: int = 64  # скільки чанків в одному запиті embed_content
+    EMBED_CONCURRENCY: int = 4  # скільки батчів одночасно в польоті
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_MAX_ROWS: int = 1_000_000  # понад це видаляються найдавніше використані
+    # Вектори запитів чату: LRU у пам'яті процесу (0 - вимкнено) + спільна таблиця embedding_cache
+    QUERY_EMBEDDING_CACHE_SIZE: int = 10_000
+    QUERY_EMBEDDING_CACHE_TTL: float = 3600.0  # секунд
+    QUERY_EMBEDDING_CACHE_SHARED: bool = True
+    QUERY_EMBEDDING_CACHE_MAX_ROWS: int = 100_000  # ліміт таблиці query_embedding_cache
+
+    # Витяг тексту з PDF: 0 - у поточному процесі, N - пул з N процесів
+    PDF_EXTRACT_WORKERS: int = 0
+    PDF_PAGES_PER_TASK: int = 25
+
+    # Пошук по HNSW-індексу: більший ef_search - краща повнота, але повільніше.
+    # Ставиться на кожне з'єднання; окремий запит може перевизначити його (ef_search=...)
+    HNSW_EF_SEARCH: int = 40
+    # pgvector >= 0.8: дочитувати індекс, якщо фільтр по проекту відсіяв кандидатів
+    HNSW_ITERATIVE_SCAN: str = "strict_order"
+
+    # sql - обидва пошуки і RRF одним запитом, python - два запити й злиття в Python
+    HYBRID_SEARCH_MODE: str = "sql"
+
+    # Клієнт закрив чат посеред відповіді: зберігати в історію початок відповіді чи ні
+    CHAT_SAVE_PARTIAL_ANSWERS: bool = False
+    # Латентність чату: не переформульовувати самодостатні питання (локальна евристика)
+    # і шукати по оригіналу паралельно з переформулюванням. Спекуляція - лише для питань
+    # без явних відсилок; вимкнена, доки частка влучань (chat_speculation) не виміряна
+    CHAT_SKIP_REWRITE_HEURISTIC: bool = True
+    CHAT_SPECULATIVE_RETRIEVAL: bool = False
+    # Семантичний кеш відповідей: майже однакове питання на тих самих документах
+    # отримує збережену відповідь без переформулювання, пошуку й генерації
+    CHAT_ANSWER_CACHE_ENABLED: bool = False
+    CHAT_ANSWER_CACHE_THRESHOLD: float = 0.95  # мінімальна косинусна схожість питань
+
+    # Ліміти завантаження файлів
+    MAX_UPLOAD_SIZE_MB: int = 100
+    MAX_UPLOAD_PAGES: int = 2000
+
+    # Потокова обробка: скільки чанків максимум між PDF і БД одночасно
+    INGEST_MAX_CHUNKS_IN_FLIGHT: int = 512
+    CHUNK_WRITE_MODE: str = "copy"  # copy - бінарний COPY через asyncpg, orm - db.add_all
+    CHUNK_WRITE_BATCH_SIZE: int = 500
+
+    # Черга фонових задач (app/worker.py)
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_VISIBILITY_TIMEOUT: int = 600  # секунд, поки lease задачі вважається живим
+    JOB_POLL_INTERVAL: float = 2.0
+    JOB_RETRY_BASE_DELAY: float = 15.0
+    JOB_RETRY_MAX_DELAY: float = 900.0
+    JOB_RECOVERY_INTERVAL: int = 300  # як часто шукати документи, що застрягли без задачі
+    # /metrics віддає лише лічильники API, тож воркер пише свої в лог (0 - вимкнено)
+    WORKER_METRICS_LOG_INTERVAL: float = 60.0
+    # Планувальник LLM працює в межах одного процесу, тож чат в API не випереджає
+    # задачі воркера. Тому воркер має жорсткі стелі на всі свої --processes разом,
+    # а решта квоти моделі лишається чату
+    WORKER_LLM_MAX_CONCURRENCY: int = 6
+    WORKER_LLM_LANE_CONCURRENCY: dict[str, int] = {"study": 2, "ingestion": 4}
+    WORKER_LLM_LANE_TOKENS_PER_MINUTE: dict[str, int] = {"study": 0, "ingestion": 0}
+
+    # Study для великих проектів: якщо текст довший за поріг - map-reduce по частинах
+    STUDY_MAP_REDUCE_THRESHOLD_CHARS: int = 200_000
+    STUDY_MAP_GROUP_CHARS: int = 60_000  # скільки тексту в одному map/reduce виклику
+    STUDY_MAP_CONCURRENCY: int = 4
+
+    # Однакові одночасні запити study: одна генерація на кластер (advisory lock)
+    STUDY_SINGLE_FLIGHT_WAIT: float = 300.0  # скільки чекати чужу генерацію, секунд
+    STUDY_SINGLE_FLIGHT_POLL_INTERVAL: float = 1.0
+
+    # Фонові study-задачі (/study/jobs)
+    STUDY_JOB_MAX_ATTEMPTS: int = 2
+    STUDY_JOB_POLL_INTERVAL: float = 1.0  # як часто SSE перевіряє стан задачі
+
+    # answer_questions: окремий гібридний пошук на кожне питання
+    STUDY_QUESTION_TOP_K: int = 6  # чанків на одне питання
+    STUDY_QUESTION_CONTEXT_MAX_CHARS: int = 60_000  # спільний контекст після злиття
+    STUDY_QUESTION_CONCURRENCY: int = 3  # пошуків (з'єднань з БД) одночасно на запит
 
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
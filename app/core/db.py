@@ -1,3 +1,4 @@
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
 
@@ -12,6 +13,16 @@ if "asyncpg" not in ASYNC_DATABASE_URL:
 
 engine = create_async_engine(ASYNC_DATABASE_URL, echo=True, future=True)  # echo = print to console
 
+
+@event.listens_for(engine.sync_engine, "connect")
+def set_vector_search_defaults(dbapi_connection, _connection_record):
+    # параметри HNSW один раз на з'єднання, щоб не платити за SET на кожен запит
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"SET hnsw.ef_search = {int(settings.HNSW_EF_SEARCH)}")
+    cursor.execute(f"SET hnsw.iterative_scan = '{settings.HNSW_ITERATIVE_SCAN}'")
+    cursor.close()
+
+
 AsyncSessionLocal = async_sessionmaker(
     bind=engine, class_=AsyncSession, expire_on_commit=False, autoflush=False
 )
@@ -108,6 +108,35 @@ Use Markdown for formatting. Bold headings (Heading), use bulleted lists (-) for
         Language: Ukrainian
         """
 
+    # Map-reduce для великих проектів: спершу конспекти частин, потім їх стиснення
+    MAP_NOTES = """
+        You are preparing study notes that will later be used to write summaries, key points and exam questions.
+
+        Extract from the text below every concept, definition, rule, formula, example and argument.
+        - Keep technical terms, names, numbers and dates exactly as written.
+        - Keep the notes dense: bulleted lists, no introductions or conclusions.
+        - Do not add information that is not in the text.
+
+        Language: Ukrainian
+
+        TEXT:
+        {context}
+        """
+
+    REDUCE_NOTES = """
+        You are merging several sets of study notes taken from different parts of the same course material.
+
+        Combine them into one set of notes:
+        - Merge duplicates, but keep every distinct concept, definition, formula and example.
+        - Keep technical terms, names, numbers and dates exactly as written.
+        - Bulleted lists, no introductions or conclusions.
+
+        Language: Ukrainian
+
+        NOTES:
+        {context}
+        """
+
 
 class ChatPrompts:
     MAIN_CHAT = """
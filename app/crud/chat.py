@@ -1,4 +1,4 @@
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import ChatHistory
@@ -10,8 +10,19 @@ async def create_chat_history(
     user_id: int,
     question: str,
     answer: str,
+    sources: list[str] | None = None,
+    question_embedding: list[float] | None = None,
+    documents_version: str | None = None,
 ) -> ChatHistory:
-    db_obj = ChatHistory(project_id=project_id, user_id=user_id, question=question, answer=answer)
+    db_obj = ChatHistory(
+        project_id=project_id,
+        user_id=user_id,
+        question=question,
+        answer=answer,
+        sources=sources,
+        question_embedding=question_embedding,
+        documents_version=documents_version,
+    )
 
     db.add(db_obj)
     await db.commit()
@@ -31,3 +42,43 @@ async def get_chat_history(
     )
     result = await db.execute(stmt)
     return list(result.scalars().all())
+
+
+async def find_similar_answer(
+    db: AsyncSession,
+    project_id: int,
+    documents_version: str,
+    question_embedding: list[float],
+    max_distance: float,
+) -> ChatHistory | None:
+    """
+    Найближче за косинусною відстанню попереднє питання проекту на тій самій
+    версії документів. Записів на проект і версію небагато, тож точний перебір
+    за індексом (project_id, documents_version) без окремого векторного індексу.
+    """
+    distance = ChatHistory.question_embedding.cosine_distance(question_embedding)
+    stmt = (
+        select(ChatHistory)
+        .filter(
+            ChatHistory.project_id == project_id,
+            ChatHistory.documents_version == documents_version,
+            ChatHistory.question_embedding.is_not(None),
+            distance <= max_distance,
+        )
+        .order_by(distance)
+        .limit(1)
+    )
+    result = await db.execute(stmt)
+    return result.scalars().first()
+
+
+async def invalidate_answer_cache(db: AsyncSession, project_id: int) -> int:
+    """Документи проекту змінились - жодна збережена відповідь більше не кешується"""
+    stmt = (
+        update(ChatHistory)
+        .where(ChatHistory.project_id == project_id, ChatHistory.question_embedding.is_not(None))
+        .values(question_embedding=None, documents_version=None)
+    )
+    result = await db.execute(stmt)
+    await db.commit()
+    return result.rowcount
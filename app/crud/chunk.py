@@ -0,0 +1,79 @@
+from contextlib import suppress
+
+from pgvector.asyncpg import register_vector
+from sqlalchemy import func, insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.document import DocumentChunk
+
+# (document_id, chunk_index, page_number, chunk_text, embedding)
+ChunkRow = tuple[int, int, int | None, str, list[float]]
+
+CHUNK_COLUMNS = ("document_id", "chunk_index", "page_number", "chunk_text", "embedding")
+
+
+async def set_vector_search_params(db: AsyncSession, ef_search: int):
+    """
+    Перевизначає hnsw.ef_search на поточну транзакцію (SET LOCAL з bind-параметром).
+    Значення за замовчуванням ставиться на з'єднання в app/core/db.py.
+    """
+    await db.execute(select(func.set_config("hnsw.ef_search", str(ef_search), True)))
+
+
+async def copy_chunks(db: AsyncSession, rows: list[ChunkRow], batch_size: int) -> int:
+    """
+    Пише чанки бінарним COPY в межах поточної транзакції сесії.
+    Кодек vector реєструється лише на час COPY: для звичайних запитів
+    SQLAlchemy передає вектори текстом, і бінарний кодек би їм заважав.
+    """
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    driver = raw_connection.driver_connection
+
+    await register_vector(driver)
+    try:
+        for i in range(0, len(rows), batch_size):
+            await driver.copy_records_to_table(
+                DocumentChunk.__tablename__,
+                records=rows[i : i + batch_size],
+                columns=CHUNK_COLUMNS,
+            )
+    finally:
+        for type_name in ("vector", "halfvec", "sparsevec"):
+            with suppress(ValueError):
+                await driver.reset_type_codec(type_name, schema="public")
+    return len(rows)
+
+
+async def add_chunks(db: AsyncSession, rows: list[ChunkRow], batch_size: int) -> int:
+    for i in range(0, len(rows), batch_size):
+        db.add_all(
+            [
+                DocumentChunk(**dict(zip(CHUNK_COLUMNS, row, strict=True)))
+                for row in rows[i : i + batch_size]
+            ]
+        )
+        await db.flush()
+    return len(rows)
+
+
+async def write_chunks(db: AsyncSession, rows: list[ChunkRow]) -> int:
+    """Зберігає чанки і комітить; спосіб запису задається CHUNK_WRITE_MODE"""
+    batch_size = max(1, settings.CHUNK_WRITE_BATCH_SIZE)
+    if settings.CHUNK_WRITE_MODE == "copy":
+        written = await copy_chunks(db, rows, batch_size)
+    else:
+        written = await add_chunks(db, rows, batch_size)
+    await db.commit()
+    return written
+
+
+async def clone_chunks(db: AsyncSession, source_document_id: int, target_document_id: int) -> int:
+    """Копіює чанки з векторами іншого документа одним INSERT ... SELECT, без участі Python"""
+    columns = [getattr(DocumentChunk, name) for name in CHUNK_COLUMNS[1:]]
+    source = select(literal(target_document_id), *columns).where(
+        DocumentChunk.document_id == source_document_id
+    )
+    result = await db.execute(insert(DocumentChunk).from_select(list(CHUNK_COLUMNS), source))
+    return result.rowcount
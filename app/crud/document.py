@@ -1,14 +1,28 @@
-from sqlalchemy import select
+from datetime import timedelta
+
+from sqlalchemy import String, cast, exists, select, update
+from sqlalchemy import delete as sql_delete
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
 
-from app.models.document import Document
+from app.models.document import Document, DocumentChunk
+from app.models.job import Job
 from app.schemas.document import DocumentCreate
 
 
 async def create(
-    db: AsyncSession, obj_in: DocumentCreate, file_path: str, project_id: int
+    db: AsyncSession,
+    obj_in: DocumentCreate,
+    file_path: str,
+    project_id: int,
+    content_hash: str | None = None,
 ) -> Document:
-    db_obj = Document(filename=obj_in.filename, file_path=file_path, project_id=project_id)
+    db_obj = Document(
+        filename=obj_in.filename,
+        file_path=file_path,
+        project_id=project_id,
+        content_hash=content_hash,
+    )
     db.add(db_obj)
     await db.commit()
     await db.refresh(db_obj)
@@ -32,7 +46,62 @@ async def get_multiple_documents_by_project_id(
     return result.scalars().all()
 
 
+async def get_by_content_hash(
+    db: AsyncSession, content_hash: str, exclude_id: int | None = None, status: str | None = None
+) -> Document | None:
+    stmt = select(Document).filter(Document.content_hash == content_hash)
+    if exclude_id is not None:
+        stmt = stmt.filter(Document.id != exclude_id)
+    if status is not None:
+        stmt = stmt.filter(Document.processing_status == status)
+    result = await db.execute(stmt.order_by(Document.id).limit(1))
+    return result.scalars().first()
+
+
+async def count_file_references(db: AsyncSession, file_path: str) -> int:
+    """Скільки документів посилаються на файл (файл спільний для дублікатів)"""
+    stmt = select(func.count(Document.id)).filter(Document.file_path == file_path)
+    return await db.scalar(stmt)
+
+
 async def delete(db: AsyncSession, db_obj: Document) -> Document:
     await db.delete(db_obj)
     await db.commit()
     return db_obj
+
+
+async def mark_failed(db: AsyncSession, document_id: int):
+    """Остаточна невдача обробки: часткові чанки видаляються, статус - failed"""
+    await db.execute(sql_delete(DocumentChunk).where(DocumentChunk.document_id == document_id))
+    await db.execute(
+        update(Document).where(Document.id == document_id).values(processing_status="failed")
+    )
+    await db.commit()
+
+
+async def get_unqueued_document_ids(db: AsyncSession, grace_seconds: int = 60) -> list[int]:
+    """Документи, що чекають обробки, але не мають активної задачі в черзі"""
+    active_job = (
+        select(Job.id)
+        .filter(Job.kind == "process_document", Job.status.in_(("queued", "running")))
+        .filter(Job.payload["document_id"].astext == cast(Document.id, String))
+    )
+    stmt = (
+        select(Document.id)
+        .filter(Document.processing_status.in_(("pending", "processing")))
+        .filter(Document.created_at < func.now() - timedelta(seconds=grace_seconds))
+        .filter(~exists(active_job))
+    )
+    result = await db.execute(stmt)
+    return list(result.scalars().all())
+
+
+async def get_completed_versions(db: AsyncSession, project_id: int) -> list[tuple[int, str | None]]:
+    """(id, content_hash) оброблених документів проекту - з них будується версія набору"""
+    stmt = (
+        select(Document.id, Document.content_hash)
+        .filter(Document.project_id == project_id, Document.processing_status == "completed")
+        .order_by(Document.id)
+    )
+    result = await db.execute(stmt)
+    return [tuple(row) for row in result.all()]
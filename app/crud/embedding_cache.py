@@ -0,0 +1,137 @@
+from datetime import timedelta
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
+
+from app.models.embedding_cache import EmbeddingCache, QueryEmbedding
+
+
+async def get_many(db: AsyncSession, keys: list[str]) -> dict[str, list[float]]:
+    """
+    Повертає знайдені вектори й оновлює їм last_used_at (для LRU). Оновлення
+    best-effort: рядки блокуються в порядку ключа і з SKIP LOCKED, тож паралельні
+    векторизації з однаковими чанками не впираються в deadlock одна одної.
+    """
+    stmt = select(EmbeddingCache.content_hash, EmbeddingCache.embedding).filter(
+        EmbeddingCache.content_hash.in_(keys)
+    )
+    result = await db.execute(stmt)
+    found = {row.content_hash: [float(x) for x in row.embedding] for row in result}
+
+    if found:
+        touch = (
+            select(EmbeddingCache.content_hash)
+            .filter(EmbeddingCache.content_hash.in_(sorted(found)))
+            .order_by(EmbeddingCache.content_hash)
+            .with_for_update(skip_locked=True)
+        )
+        await db.execute(
+            update(EmbeddingCache)
+            .where(EmbeddingCache.content_hash.in_(touch.scalar_subquery()))
+            .values(last_used_at=func.now())
+        )
+    await db.commit()
+    return found
+
+
+async def put_many(
+    db: AsyncSession, items: dict[str, list[float]], model: str, dimensionality: int
+):
+    if not items:
+        return
+    stmt = insert(EmbeddingCache).values(
+        [
+            {
+                "content_hash": key,
+                "model": model,
+                "dimensionality": dimensionality,
+                "embedding": vector,
+            }
+            for key, vector in items.items()
+        ]
+    )
+    await db.execute(stmt.on_conflict_do_nothing(index_elements=["content_hash"]))
+    await db.commit()
+
+
+async def evict_lru(db: AsyncSession, max_rows: int) -> int:
+    """
+    Видаляє рівно стільки найдавніше використаних записів, скільки понад max_rows.
+    Видалення за первинним ключем: записи одного батчу мають однаковий now(),
+    тож поріг за last_used_at зніс би й ті, що мали лишитись.
+    """
+    excess = (await db.execute(select(func.count()).select_from(EmbeddingCache))).scalar_one()
+    excess -= max_rows
+    if excess <= 0:
+        return 0
+
+    oldest = (
+        select(EmbeddingCache.content_hash)
+        .order_by(EmbeddingCache.last_used_at, EmbeddingCache.content_hash)
+        .limit(excess)
+    )
+    result = await db.execute(
+        delete(EmbeddingCache).where(EmbeddingCache.content_hash.in_(oldest.scalar_subquery()))
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def get_query(
+    db: AsyncSession, key: str, max_age_seconds: float
+) -> tuple[list[float], float] | None:
+    """
+    Вектор запиту і його вік у секундах, якщо він не старший за max_age_seconds.
+    Лише читання: без блокувань і оновлень на шляху чату.
+    """
+    age = func.extract("epoch", func.now() - QueryEmbedding.created_at)
+    stmt = select(QueryEmbedding.embedding, age).filter(
+        QueryEmbedding.query_hash == key,
+        QueryEmbedding.created_at > func.now() - timedelta(seconds=max_age_seconds),
+    )
+    row = (await db.execute(stmt)).first()
+    if row is None:
+        return None
+    return [float(x) for x in row[0]], float(row[1])
+
+
+async def put_query(
+    db: AsyncSession, key: str, vector: list[float], model: str, dimensionality: int
+):
+    # прострочений запис перезаписується разом з created_at, інакше він блокував би ключ
+    stmt = insert(QueryEmbedding).values(
+        query_hash=key, model=model, dimensionality=dimensionality, embedding=vector
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["query_hash"],
+        set_={"embedding": stmt.excluded.embedding, "created_at": func.now()},
+    )
+    await db.execute(stmt)
+    await db.commit()
+
+
+async def evict_queries(db: AsyncSession, max_age_seconds: float, max_rows: int) -> int:
+    """Видаляє прострочені вектори запитів, а потім найстаріші понад max_rows"""
+    expired = await db.execute(
+        delete(QueryEmbedding).where(
+            QueryEmbedding.created_at <= func.now() - timedelta(seconds=max_age_seconds)
+        )
+    )
+    evicted = expired.rowcount
+
+    excess = (await db.execute(select(func.count()).select_from(QueryEmbedding))).scalar_one()
+    excess -= max_rows
+    if excess > 0:
+        oldest = (
+            select(QueryEmbedding.query_hash)
+            .order_by(QueryEmbedding.created_at, QueryEmbedding.query_hash)
+            .limit(excess)
+        )
+        result = await db.execute(
+            delete(QueryEmbedding).where(QueryEmbedding.query_hash.in_(oldest.scalar_subquery()))
+        )
+        evicted += result.rowcount
+    await db.commit()
+    return evicted
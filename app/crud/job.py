@@ -0,0 +1,124 @@
+from datetime import timedelta
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
+
+from app.core.config import settings
+from app.models.job import Job
+
+
+async def enqueue(
+    db: AsyncSession, kind: str, payload: dict, max_attempts: int | None = None
+) -> Job:
+    db_obj = Job(
+        kind=kind,
+        payload=payload,
+        status="queued",
+        attempts=0,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+    db.add(db_obj)
+    await db.commit()
+    await db.refresh(db_obj)
+    return db_obj
+
+
+async def claim(
+    db: AsyncSession, kinds: list[str], worker_id: str, visibility_timeout: int
+) -> Job | None:
+    """
+    Забирає одну готову задачу. Задачі, чий lease прострочився (воркер впав),
+    вважаються знову доступними. SKIP LOCKED дозволяє багатьом воркерам
+    брати різні рядки без блокувань одне одного.
+    """
+    stmt = (
+        select(Job)
+        .filter(Job.kind.in_(kinds))
+        .filter(
+            or_(
+                and_(Job.status == "queued", Job.run_after <= func.now()),
+                and_(Job.status == "running", Job.locked_until < func.now()),
+            )
+        )
+        .order_by(Job.run_after, Job.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(stmt)
+    job = result.scalars().first()
+    if not job:
+        await db.rollback()
+        return None
+
+    job.status = "running"
+    job.attempts += 1
+    job.locked_by = worker_id
+    job.locked_until = func.now() + timedelta(seconds=visibility_timeout)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+async def heartbeat(db: AsyncSession, job_id: int, worker_id: str, visibility_timeout: int) -> bool:
+    """Продовжує lease задачі; False, якщо задачу вже забрав інший воркер"""
+    stmt = (
+        update(Job)
+        .where(Job.id == job_id, Job.locked_by == worker_id, Job.status == "running")
+        .values(locked_until=func.now() + timedelta(seconds=visibility_timeout))
+    )
+    result = await db.execute(stmt)
+    await db.commit()
+    return result.rowcount > 0
+
+
+async def get(db: AsyncSession, job_id: int) -> Job | None:
+    result = await db.execute(select(Job).filter(Job.id == job_id))
+    return result.scalars().first()
+
+
+async def set_progress(db: AsyncSession, job_id: int, progress: int, message: str | None = None):
+    stmt = (
+        update(Job)
+        .where(Job.id == job_id, Job.status == "running")
+        .values(progress=max(0, min(100, progress)), message=message)
+    )
+    await db.execute(stmt)
+    await db.commit()
+
+
+async def complete(db: AsyncSession, job_id: int, worker_id: str, result: dict | None = None):
+    stmt = (
+        update(Job)
+        .where(Job.id == job_id, Job.locked_by == worker_id)
+        .values(
+            status="done",
+            locked_until=None,
+            last_error=None,
+            progress=100,
+            message=None,
+            result=result,
+        )
+    )
+    await db.execute(stmt)
+    await db.commit()
+
+
+async def retry_or_fail(
+    db: AsyncSession, job: Job, worker_id: str, error: str, backoff_seconds: float
+) -> str:
+    """Повертає задачу в чергу з затримкою або остаточно позначає failed"""
+    status = "failed" if job.attempts >= job.max_attempts else "queued"
+    stmt = (
+        update(Job)
+        .where(Job.id == job.id, Job.locked_by == worker_id)
+        .values(
+            status=status,
+            last_error=error[:2000],
+            locked_until=None,
+            run_after=func.now() + timedelta(seconds=backoff_seconds),
+        )
+    )
+    await db.execute(stmt)
+    await db.commit()
+    return status
@@ -0,0 +1,56 @@
+from sqlalchemy import delete, or_, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.analysis import StudyCache
+
+
+async def get(db: AsyncSession, project_id: int, cache_key: str) -> StudyCache | None:
+    stmt = select(StudyCache).filter(
+        StudyCache.project_id == project_id, StudyCache.cache_key == cache_key
+    )
+    result = await db.execute(stmt.execution_options(populate_existing=True))
+    return result.scalars().first()
+
+
+async def upsert(
+    db: AsyncSession,
+    project_id: int,
+    cache_key: str,
+    field: str,
+    document_ids: list[int],
+    is_full_project: bool,
+    content,
+):
+    """Один INSERT ... ON CONFLICT замість select-then-insert, безпечно при гонках"""
+    stmt = insert(StudyCache).values(
+        project_id=project_id,
+        cache_key=cache_key,
+        field=field,
+        document_ids=document_ids,
+        is_full_project=is_full_project,
+        content=content,
+    )
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_study_cache_project_key",
+        set_={"content": stmt.excluded.content, "created_at": stmt.excluded.created_at},
+    )
+    await db.execute(stmt)
+    await db.commit()
+
+
+async def invalidate_for_document(db: AsyncSession, project_id: int, document_id: int) -> int:
+    """
+    Прибирає результати, яких торкається зміна документа: побудовані на ньому
+    і всі результати "по всьому проекту" (набір документів проекту змінився).
+    """
+    stmt = delete(StudyCache).where(
+        StudyCache.project_id == project_id,
+        or_(
+            StudyCache.is_full_project.is_(True),
+            StudyCache.document_ids.contains([document_id]),
+        ),
+    )
+    result = await db.execute(stmt)
+    await db.commit()
+    return result.rowcount
@@ -1,5 +1,6 @@
 from fastapi import Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -8,7 +9,9 @@ from app.api.v1.chat import router as chat_router
 from app.api.v1.documents import router as document_router
 from app.api.v1.projects import router as project_router
 from app.api.v1.study import router as study_router
+from app.core.config import settings
 from app.core.db import get_db
+from app.core.metrics import metrics
 
 app = FastAPI()
 origins = [
@@ -25,6 +28,32 @@ app.add_middleware(
     allow_methods=["*"],  # Дозволити всі методи (GET, POST, DELETE...)
     allow_headers=["*"],  # Дозволити всі заголовки (Authorization, Content-Type...)
 )
+
+
+class RequestSizeLimitMiddleware:
+    """Відкидає завеликі тіла за Content-Length ще до читання multipart"""
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            content_length = dict(scope["headers"]).get(b"content-length", b"")
+            if content_length.isdigit() and int(content_length) > self.max_bytes:
+                response = JSONResponse(
+                    status_code=413,
+                    content={"detail": f"File is larger than {settings.MAX_UPLOAD_SIZE_MB} MB"},
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+app.add_middleware(
+    RequestSizeLimitMiddleware,
+    max_bytes=settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024 + 64 * 1024,  # + запас на multipart
+)
 app.include_router(auth_router)
 app.include_router(project_router)
 app.include_router(document_router)
@@ -46,3 +75,12 @@ async def db_health(db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e)) from e
 
     return {"message": "OK"}
+
+
+@app.get("/metrics")
+def read_metrics():
+    """
+    Лічильники поточного процесу (кеші, черги LLM тощо). Воркер рахує свої
+    (векторизація, кеш векторів) і пише їх у лог раз на WORKER_METRICS_LOG_INTERVAL.
+    """
+    return metrics.snapshot()
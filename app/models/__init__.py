@@ -1,7 +1,9 @@
-from .analysis import ProjectAnalysis as ProjectAnalysis
-from .analysis import ProjectAnalysisItem as ProjectAnalysisItem
+from .analysis import StudyCache as StudyCache
 from .chat import ChatHistory as ChatHistory
 from .document import Document as Document
 from .document import DocumentChunk as DocumentChunk
+from .embedding_cache import EmbeddingCache as EmbeddingCache
+from .embedding_cache import QueryEmbedding as QueryEmbedding
+from .job import Job as Job
 from .project import Project as Project
 from .user import User as User
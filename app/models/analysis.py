@@ -1,33 +1,42 @@
-from sqlalchemy import ForeignKey, String, Text
-from sqlalchemy.dialects.postgresql import JSONB
+from datetime import datetime
+
+from sqlalchemy import Boolean, ForeignKey, Index, Integer, String, UniqueConstraint
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.sql import func
 
 from app.core.db import Base
 
 
-class ProjectAnalysis(Base):
-    __tablename__ = "project_analysis"
+class StudyCache(Base):
+    """
+    Готові результати study-інструментів. cache_key - SHA-256 від версії вмісту
+    документів, тексту промпту, моделі й параметрів запиту, тож будь-яка зміна
+    дає новий ключ; старі записи прибирає інвалідація по document_ids.
+    """
+
+    __tablename__ = "study_cache"
 
     id: Mapped[int] = mapped_column(primary_key=True)
     project_id: Mapped[int] = mapped_column(ForeignKey("projects.id", ondelete="CASCADE"))
 
-    summary: Mapped[str | None] = mapped_column(Text, nullable=True)
-    key_points: Mapped[str | None] = mapped_column(Text, nullable=True)
-    exam_questions: Mapped[str | None] = mapped_column(JSONB, nullable=True)
-
-    project = relationship("Project", back_populates="analysis")
+    cache_key: Mapped[str] = mapped_column(String(64))
+    field: Mapped[str] = mapped_column(String(50))  # summary, key_points, exam_questions
 
+    # на яких документах побудовано результат; весь проект - is_full_project
+    document_ids: Mapped[list[int]] = mapped_column(ARRAY(Integer))
+    is_full_project: Mapped[bool] = mapped_column(Boolean, default=False)
 
-class ProjectAnalysisItem(Base):
-    __tablename__ = "project_analysis_item"
+    content: Mapped[dict | list | str] = mapped_column(JSONB)
 
-    id: Mapped[int] = mapped_column(primary_key=True)
-    project_id: Mapped[int] = mapped_column(ForeignKey("projects.id", ondelete="CASCADE"))
+    created_at: Mapped[datetime] = mapped_column(server_default=func.now())
 
-    documents_hash: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
+    project = relationship("Project", back_populates="study_cache")
 
-    summary: Mapped[str | None] = mapped_column(Text, nullable=True)
-    key_points: Mapped[str | None] = mapped_column(Text, nullable=True)
-    exam_questions: Mapped[str | None] = mapped_column(JSONB, nullable=True)
+    __table_args__ = (
+        UniqueConstraint("project_id", "cache_key", name="uq_study_cache_project_key"),
+        Index("ix_study_cache_document_ids", "document_ids", postgresql_using="gin"),
+    )
 
-    project = relationship("Project")
+    def __repr__(self):
+        return f"<StudyCache(project_id={self.project_id}, field='{self.field}')>"
@@ -1,6 +1,8 @@
 from datetime import datetime
 
-from sqlalchemy import ForeignKey, Text
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import ForeignKey, Index, String, Text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 
@@ -17,11 +19,21 @@ class ChatHistory(Base):
 
     question: Mapped[str] = mapped_column(Text)
     answer: Mapped[str] = mapped_column(Text)
+    sources: Mapped[list[str] | None] = mapped_column(JSONB, nullable=True)
+
+    # семантичний кеш відповідей (CHAT_ANSWER_CACHE_ENABLED): вектор питання і версія
+    # набору документів, на якому побудована відповідь; NULL - запис не кешується
+    question_embedding: Mapped[list[float] | None] = mapped_column(
+        Vector(768), nullable=True, deferred=True
+    )
+    documents_version: Mapped[str | None] = mapped_column(String(64), nullable=True)
 
     created_at: Mapped[datetime] = mapped_column(server_default=func.now())
 
     project = relationship("Project")
     user = relationship("User")
 
+    __table_args__ = (Index("ix_chat_history_project_version", "project_id", "documents_version"),)
+
     def __repr__(self):
         return f"<Chat History id: {self.id}, question: {self.question}, answer: {self.answer}, created_at: {self.created_at}>"
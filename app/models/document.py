@@ -18,6 +18,8 @@ class Document(Base):
     filename: Mapped[str] = mapped_column(String(255))
 
     file_path: Mapped[str] = mapped_column(String(255))
+    # SHA-256 вмісту файлу: однакові файли зберігаються й обробляються один раз
+    content_hash: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
 
     project_id: Mapped[int] = mapped_column(ForeignKey("projects.id", ondelete="CASCADE"))
     processing_status: Mapped[str] = mapped_column(String(50), default="pending")
@@ -39,16 +41,19 @@ class DocumentChunk(Base):
     id: Mapped[int] = mapped_column(primary_key=True)
 
     chunk_index: Mapped[int] = mapped_column(Integer)
+    page_number: Mapped[int | None] = mapped_column(Integer, nullable=True)
 
     document_id: Mapped[int] = mapped_column(ForeignKey("document.id", ondelete="CASCADE"))
 
     chunk_text: Mapped[str] = mapped_column(Text)
 
-    embedding: Mapped[list[float]] = mapped_column(Vector(768))  # розмірність чанку
+    # deferred: важкі колонки не вантажаться разом з чанком, лише при явному зверненні
+    embedding: Mapped[list[float]] = mapped_column(Vector(768), deferred=True)  # розмірність чанку
     content_tsvector: Mapped[str] = mapped_column(
         TSVECTOR,
         Computed("to_tsvector('simple', chunk_text)", persisted=True),
         nullable=True,
+        deferred=True,
     )
 
     document: Mapped["Document"] = relationship(back_populates="chunks")
@@ -59,6 +64,14 @@ class DocumentChunk(Base):
             "content_tsvector",
             postgresql_using="gin",
         ),
+        # ANN-індекс для пошуку за l2_distance (оператор <->)
+        Index(
+            "ix_document_chunks_embedding_hnsw",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": "vector_l2_ops"},
+        ),
     )
 
     def __repr__(self):
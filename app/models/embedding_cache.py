@@ -0,0 +1,46 @@
+from datetime import datetime
+
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from app.core.db import Base
+
+
+class EmbeddingCache(Base):
+    """Вектори, спільні для всіх документів і проектів; ключ - хеш тексту + модель + розмірність"""
+
+    __tablename__ = "embedding_cache"
+
+    content_hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+
+    model: Mapped[str] = mapped_column(String(100))
+    dimensionality: Mapped[int] = mapped_column(Integer)
+    embedding: Mapped[list[float]] = mapped_column(Vector(768))
+
+    created_at: Mapped[datetime] = mapped_column(server_default=func.now())
+    last_used_at: Mapped[datetime] = mapped_column(server_default=func.now(), index=True)
+
+    def __repr__(self):
+        return f"<EmbeddingCache(hash={self.content_hash[:12]}, model='{self.model}')>"
+
+
+class QueryEmbedding(Base):
+    """
+    Вектори запитів чату, спільні для всіх процесів API. Окремо від embedding_cache:
+    свій TTL (від created_at) і свій ліміт рядків, без LRU-оновлень при читанні.
+    """
+
+    __tablename__ = "query_embedding_cache"
+
+    query_hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+
+    model: Mapped[str] = mapped_column(String(100))
+    dimensionality: Mapped[int] = mapped_column(Integer)
+    embedding: Mapped[list[float]] = mapped_column(Vector(768))
+
+    created_at: Mapped[datetime] = mapped_column(server_default=func.now(), index=True)
+
+    def __repr__(self):
+        return f"<QueryEmbedding(hash={self.query_hash[:12]}, model='{self.model}')>"
@@ -6,10 +6,9 @@ from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 
 from app.core.db import Base
-from app.models import ProjectAnalysisItem
 
 if TYPE_CHECKING:
-    from .analysis import ProjectAnalysis, ProjectAnalysisItem
+    from .analysis import StudyCache
     from .document import Document
     from .user import User
 
@@ -34,15 +33,8 @@ class Project(Base):
         back_populates="project",
         cascade="all, delete-orphan",
     )
-    analysis: Mapped["ProjectAnalysis"] = relationship(
-        "ProjectAnalysis",
-        back_populates="project",
-        uselist=False,  # Це зв'язок One-to-One
-        cascade="all, delete-orphan",
-    )
-
-    analysis_items: Mapped[list["ProjectAnalysisItem"]] = relationship(
-        "ProjectAnalysisItem", back_populates="project", cascade="all, delete-orphan"
+    study_cache: Mapped[list["StudyCache"]] = relationship(
+        "StudyCache", back_populates="project", cascade="all, delete-orphan"
     )
 
 
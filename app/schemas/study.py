@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -21,11 +21,22 @@ class ExamRequest(BaseStudyRequest):
 class UserQuestionsRequest(BaseModel):
     """Використовується для 'Ask Questions'"""
 
-    questions: List[str]
+    questions: List[str] = Field(..., max_length=20)
 
     document_ids: Optional[List[int]] = None
 
 
+class StudyJobRequest(BaseStudyRequest):
+    """Фонова генерація: tool визначає, які поля використовуються"""
+
+    tool: Literal["summary", "keypoints", "exam", "answer_questions"]
+    difficulty: str = Field("Medium", description="Easy, Medium, Hard (exam)")
+    question_count: int = Field(10, ge=1, le=20, description="Only for exam")
+    questions: Optional[List[str]] = Field(
+        None, max_length=20, description="Only for answer_questions"
+    )
+
+
 class KeyPoints(BaseModel):
     title: str
     description: str
@@ -61,3 +72,13 @@ class UserQuestionsResponse(BaseModel):
 
 class KeyPointsResponse(BaseModel):
     points: List[KeyPoints]
+
+
+class StudyJobResponse(BaseModel):
+    id: int
+    status: str  # queued, running, done, failed
+    progress: int
+    message: Optional[str] = None
+    # для summary - {"content": ...}, для решти - як у відповідних синхронних ендпоінтах
+    result: Optional[dict] = None
+    error: Optional[str] = None
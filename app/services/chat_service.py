@@ -1,37 +1,105 @@
+import asyncio
+import hashlib
 import json
-from math import inf
+import re
+import time
+from contextlib import aclosing
 
-from google import genai
 from langsmith import traceable
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
-from sqlalchemy.sql import func
 
 from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.core.metrics import metrics
 from app.core.prompts import ChatPrompts
-from app.crud.chat import create_chat_history
+from app.crud import document as crud_document
+from app.crud.chat import create_chat_history, find_similar_answer
 from app.models.chat import ChatHistory
-from app.models.document import Document, DocumentChunk
+from app.services.embedding_cache import normalize_query
+from app.services.llm_gateway import llm_gateway
+from app.services.llm_scheduler import estimate_tokens
 from app.services.rag_service import rag_service
-
-client = genai.Client(api_key=settings.GEMINI_API_KEY)
+from app.services.retrieval_service import RetrievedChunk, retrieval_service
+
+# слова, що відсилають до попередніх повідомлень: питання з ними треба переформулювати
+FOLLOW_UP_MARKERS = frozenset(
+    "це цей ця цього цієї цьому цим ці цих той те того тієї тому ті тих "
+    "він вона воно вони його її їх йому їй їм ним нею ними там тут тоді "
+    "ще також детальніше докладніше більше далі попереднє попередній вище "
+    "it its this that these those they them their he she him her there more above".split()
+)
+# питання, що починається з "а ...", "і ...", "а що з ..." - продовження розмови
+FOLLOW_UP_OPENERS = frozenset("а і й та але ну то and but so also".split())
+# порядкові ("другий розділ", "останній приклад") відсилають до вже названого списку
+ORDINAL_PREFIXES = (
+    "перш", "друг", "трет", "четверт", "п'ят", "шост", "сьом", "восьм", "дев'ят", "десят",
+    "останн", "наступн", "попередн",
+    "first", "second", "third", "fourth", "fifth", "last", "next", "previous",
+)  # fmt: skip
 
 
 class ChatService:
-    @traceable(name="rewrite_question")
-    async def _reformat_question(self, db: AsyncSession, question: str, project_id: int):
+    """
+    Під час стріму відповіді з'єднання з БД не тримається: історія, пошук і
+    запис відповіді беруть окремі короткі сесії, тож кількість одночасних
+    чатів не обмежена розміром пулу.
+    """
+
+    REPLAY_CHUNK_CHARS = 200
+
+    def __init__(self):
+        # середня довжина повної відповіді - для оцінки токенів, зекономлених скасуванням
+        self._avg_answer_tokens = 0.0
+
+    # --- QUERY PIPELINE ---
+
+    async def _load_history(self, project_id: int) -> list[ChatHistory]:
         stmt = (
             select(ChatHistory)
             .filter(ChatHistory.project_id == project_id)
             .order_by(ChatHistory.created_at.desc())
             .limit(3)
         )
-        result = await db.execute(stmt)
-        last_messages = result.scalars().all()
-        if not last_messages:
-            return question
+        with metrics.timer("chat_stage_seconds", stage="history"):
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(stmt)
+                return list(result.scalars().all())
+
+    @staticmethod
+    def _follow_up_signal(question: str) -> str | None:
+        """
+        Дешева локальна евристика: "marker" - питання починається з "а"/"і"/"але"
+        або містить відсилки ("це", "він", "вище", порядкові "другий", "останній"...),
+        "short" - відсилок немає, але питання надто коротке, щоб бути певним,
+        None - питання самодостатнє.
+        """
+        # пунктуацію прибираємо з кожного слова, а не лише в кінці питання ("вище:")
+        words = re.findall(r"[\w']+", normalize_query(question).replace("’", "'"))
+        if words and words[0] in FOLLOW_UP_OPENERS:
+            return "marker"
+        if any(word in FOLLOW_UP_MARKERS or word.startswith(ORDINAL_PREFIXES) for word in words):
+            return "marker"
+        return "short" if len(words) < 4 else None
+
+    @classmethod
+    def _needs_rewrite(cls, question: str, last_messages: list[ChatHistory]) -> bool:
+        """Переформулювання потрібне лише за наявності історії і сигналу уточнення"""
+        if not last_messages or not settings.CHAT_SKIP_REWRITE_HEURISTIC:
+            return bool(last_messages)
+        return cls._follow_up_signal(question) is not None
+
+    @classmethod
+    def _is_self_contained(cls, question: str, last_messages: list[ChatHistory]) -> bool:
+        """
+        Чи можна відповідати на питання без історії. Не залежить від
+        CHAT_SKIP_REWRITE_HEURISTIC: вимкнене пропускання переформулювання
+        не повинно вимикати кеш відповідей.
+        """
+        return not last_messages or cls._follow_up_signal(question) is None
 
+    @traceable(name="rewrite_question")
+    async def _reformat_question(self, question: str, last_messages: list[ChatHistory]):
         history_str = ""
 
         for item in reversed(last_messages):
@@ -40,79 +108,163 @@ class ChatService:
         prompt = ChatPrompts.REFORMAT_USER_QUESTION.format(history=history_str, question=question)
 
         try:
-            response = client.models.generate_content(
-                model="gemini-2.5-flash-lite", contents=prompt
-            )
-
-            return response.text.strip()
+            with metrics.timer("chat_stage_seconds", stage="rewrite"):
+                response = await llm_gateway.generate(prompt, model=settings.GEMINI_REWRITE_MODEL)
+            return response.strip() or question
         except Exception as e:
             print(f"Gemini Error: {e}")
             return question
 
-    def _rrf_merge(self, vector_results, keyword_results, k=60, w_vec=1.0, w_kw=0.8, top_n=20):
-        scores = {}
-
-        def add(results, weight):
-            for rank, item in enumerate(results):
-                entry = scores.get(item.id)
-                if entry is None:
-                    entry = {"item": item, "score": 0.0, "best_rank": inf}
-                    scores[item.id] = entry
-
-                entry["score"] += weight / (k + rank + 1)
-                if rank < entry["best_rank"]:
-                    entry["best_rank"] = rank
-
-        add(vector_results, w_vec)
-        add(keyword_results, w_kw)
-
-        # sort by: score desc, best_rank asc, id asc
-
-        sorted_entries = sorted(
-            scores.items(),
-            key=lambda kv: (-kv[1]["score"], kv[1]["best_rank"], kv[0]),
-        )
+    async def _retrieve(
+        self, project_id: int, query: str
+    ) -> tuple[list[float], list[RetrievedChunk]]:
+        with metrics.timer("chat_stage_seconds", stage="embedding"):
+            query_vector = await rag_service.get_embedding(query)
+        if not query_vector:
+            return [], []
+        # 2. Пошук схожих шматків у базі (вектор + ключові слова, RRF)
+        with metrics.timer("chat_stage_seconds", stage="retrieval"):
+            async with AsyncSessionLocal() as db:
+                chunks = await retrieval_service.hybrid_search(db, project_id, query, query_vector)
+        return query_vector, chunks
+
+    async def _resolve_query(
+        self, project_id: int, question: str, last_messages: list[ChatHistory]
+    ) -> tuple[str, list[float], list[RetrievedChunk]]:
+        """
+        Питання для пошуку, його вектор і знайдені чанки. Поки модель
+        переформульовує питання, пошук по оригіналу вже йде: якщо модель
+        повернула те саме питання, його результат використовується одразу.
+        """
+        if not self._needs_rewrite(question, last_messages):
+            if last_messages:
+                metrics.inc("chat_rewrite_skipped")
+            return question, *await self._retrieve(project_id, question)
+
+        # з явною відсилкою модель майже завжди змінює питання - спекуляція лише змарнує пошук
+        if not settings.CHAT_SPECULATIVE_RETRIEVAL or self._follow_up_signal(question) == "marker":
+            query = await self._reformat_question(question, last_messages)
+            return query, *await self._retrieve(project_id, query)
+
+        speculative = asyncio.create_task(self._retrieve(project_id, question))
+        # помилка відкинутої спекуляції не повинна потрапити в лог як "never retrieved"
+        speculative.add_done_callback(lambda task: task.cancelled() or task.exception())
+        try:
+            query = await self._reformat_question(question, last_messages)
+            if normalize_query(query) == normalize_query(question):
+                metrics.inc("chat_speculation", outcome="hit")
+                return question, *await speculative
+            metrics.inc("chat_speculation", outcome="miss")
+            speculative.cancel()
+            return query, *await self._retrieve(project_id, query)
+        finally:
+            speculative.cancel()
+
+    async def _save_history(
+        self, project_id: int, user_id: int, question: str, answer: str, **cache_fields
+    ):
+        async with AsyncSessionLocal() as db:
+            await create_chat_history(
+                db=db,
+                project_id=project_id,
+                user_id=user_id,
+                question=question,
+                answer=answer,
+                **cache_fields,
+            )
 
-        return [entry["item"] for _, entry in sorted_entries[:top_n]]
+    # --- SEMANTIC ANSWER CACHE ---
+
+    async def _documents_version(self, db: AsyncSession, project_id: int) -> str:
+        versions = await crud_document.get_completed_versions(db, project_id)
+        return hashlib.sha256(json.dumps(versions).encode()).hexdigest()
+
+    async def _find_cached_answer(
+        self, project_id: int, question: str
+    ) -> tuple[ChatHistory | None, str, list[float]]:
+        """
+        Шукає майже таке саме попереднє питання на поточній версії документів.
+        Вектор сирого питання зазвичай уже в кеші векторів запитів, тож промах
+        коштує один короткий запит до БД. Той самий вектор потім зберігається
+        з відповіддю, навіть якщо для пошуку питання переформульовувалось.
+        """
+        vector = await rag_service.get_embedding(question)
+        async with AsyncSessionLocal() as db:
+            version = await self._documents_version(db, project_id)
+            if not vector:
+                return None, version, vector
+            cached = await find_similar_answer(
+                db, project_id, version, vector, 1 - settings.CHAT_ANSWER_CACHE_THRESHOLD
+            )
+        metrics.inc("chat_answer_cache_hits" if cached else "chat_answer_cache_misses")
+        return cached, version, vector
+
+    async def _replay_answer(self, project_id: int, user_id: int, question: str, cached):
+        """Збережена відповідь у тому самому SSE-форматі, що й згенерована"""
+        yield f"data: {json.dumps({'type': 'sources', 'data': cached.sources or []})}\n\n"
+        step = self.REPLAY_CHUNK_CHARS
+        for start in range(0, len(cached.answer), step):
+            chunk = cached.answer[start : start + step]
+            yield f"data: {json.dumps({'type': 'answer', 'data': chunk})}\n\n"
+        try:
+            # в історії користувача питання має бути, але як джерело кешу - лише оригінал
+            await self._save_history(
+                project_id, user_id, question, cached.answer, sources=cached.sources
+            )
+        except Exception as e:
+            print(f"History Error: {e}")
+
+    async def _on_cancel(self, project_id: int, user_id: int, question: str, partial: str):
+        """Клієнт відключився: рахуємо метрики і, якщо дозволено, зберігаємо початок відповіді"""
+        stage = "generation" if partial else "retrieval"
+        metrics.inc("chat_streams_cancelled", stage=stage)
+        if self._avg_answer_tokens:
+            generated = estimate_tokens(partial) if partial else 0
+            metrics.inc(
+                "chat_stream_tokens_saved", max(0, round(self._avg_answer_tokens) - generated)
+            )
+        if partial and settings.CHAT_SAVE_PARTIAL_ANSWERS:
+            try:
+                await self._save_history(project_id, user_id, question, partial)
+            except Exception as e:
+                print(f"History Error: {e}")
 
     @traceable(name="chat_pipeline")
-    async def stream_chat(self, db: AsyncSession, project_id: int, user_id: int, query_text: str):
-        query_reformat = await self._reformat_question(db, query_text, project_id)
-        query_vector = rag_service.get_embedding(query_reformat)
-
+    async def stream_chat(self, project_id: int, user_id: int, query_text: str):
+        answer: list[str] = []
+        try:
+            async for event in self._chat_events(project_id, user_id, query_text, answer):
+                yield event
+        except (asyncio.CancelledError, GeneratorExit):
+            await self._on_cancel(project_id, user_id, query_text, "".join(answer))
+            raise
+
+    async def _chat_events(self, project_id: int, user_id: int, query_text: str, answer: list[str]):
+        """SSE-події чату; згенерований текст накопичується в answer"""
+        started = time.perf_counter()
+        last_messages = await self._load_history(project_id)
+        cache_fields = {}
+        # уточнення залежить від історії: його не шукаємо і не кладемо в кеш відповідей
+        if settings.CHAT_ANSWER_CACHE_ENABLED and self._is_self_contained(
+            query_text, last_messages
+        ):
+            cached, version, question_vector = await self._find_cached_answer(
+                project_id, query_text
+            )
+            if cached is not None:
+                async for event in self._replay_answer(project_id, user_id, query_text, cached):
+                    yield event
+                return
+            if question_vector:
+                cache_fields["documents_version"] = version
+                cache_fields["question_embedding"] = question_vector
+
+        query_reformat, query_vector, final_chunks = await self._resolve_query(
+            project_id, query_text, last_messages
+        )
         if not query_vector:
             yield f"data: {json.dumps({'error': 'Error creating embedding'})}\n\n"
             return
-        # 2. Пошук схожих шматків у базі
-        vector_stmt = (
-            select(DocumentChunk)
-            .options(joinedload(DocumentChunk.document))
-            .join(Document)
-            .filter(Document.project_id == project_id)
-            .order_by(DocumentChunk.embedding.l2_distance(query_vector))
-            .limit(5)
-        )
-
-        vector_result = await db.execute(vector_stmt)
-        vector_chunks = vector_result.scalars().all()
-
-        keyword_stmt = (
-            select(DocumentChunk)
-            .options(joinedload(DocumentChunk.document))
-            .join(Document)
-            .filter(Document.project_id == project_id)
-            .filter(
-                DocumentChunk.content_tsvector.op("@@")(
-                    func.websearch_to_tsquery("simple", query_reformat)
-                )
-            )
-            .limit(10)
-        )
-
-        result = await db.execute(keyword_stmt)
-        keyword_chunks = result.scalars().all()
-
-        final_chunks = self._rrf_merge(vector_chunks, keyword_chunks)
 
         final_chunks = final_chunks[:7]
         context_text = ""
@@ -120,7 +272,7 @@ class ChatService:
 
         if final_chunks:
             context_text = "\n\n".join([chunk.chunk_text for chunk in final_chunks])
-            sources = list(set([chunk.document.filename for chunk in final_chunks]))
+            sources = list(set([chunk.filename for chunk in final_chunks]))
 
         yield f"data: {json.dumps({'type': 'sources', 'data': sources})}\n\n"
 
@@ -131,24 +283,28 @@ class ChatService:
         prompt = ChatPrompts.MAIN_CHAT.format(context=context_text, query=query_reformat)
 
         try:
-            response_stream = client.models.generate_content_stream(
-                model=settings.GEMINI_MODEL, contents=prompt
-            )
-
-            full_answer = ""
-
-            for chunk in response_stream:
-                if chunk.text:
-                    yield f"data: {json.dumps({'type': 'answer', 'data': chunk.text})}\n\n"
-                    full_answer += chunk.text
-
-            await create_chat_history(
-                db=db,
-                project_id=project_id,
-                user_id=user_id,
-                question=query_text,
-                answer=full_answer,
+            # aclosing: при скасуванні стрім до Gemini закривається одразу, а не зі збирачем сміття
+            async with aclosing(llm_gateway.stream(prompt)) as stream:
+                async for text in stream:
+                    if not answer:
+                        metrics.observe(
+                            "chat_stage_seconds",
+                            time.perf_counter() - started,
+                            stage="time_to_first_token",
+                        )
+                    answer.append(text)
+                    yield f"data: {json.dumps({'type': 'answer', 'data': text})}\n\n"
+
+            full_answer = "".join(answer)
+            tokens = estimate_tokens(full_answer)
+            self._avg_answer_tokens = (
+                tokens
+                if not self._avg_answer_tokens
+                else 0.9 * self._avg_answer_tokens + 0.1 * tokens
             )
+            if cache_fields:
+                cache_fields["sources"] = sources
+            await self._save_history(project_id, user_id, query_text, full_answer, **cache_fields)
         except Exception as e:
             print(f"Stream Error: {e}")
             yield f"data: {json.dumps({'error': str(e)})}\n\n"
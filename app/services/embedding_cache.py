@@ -0,0 +1,161 @@
+import asyncio
+import hashlib
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.core.metrics import metrics
+from app.crud import embedding_cache as crud_embedding_cache
+
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def normalize_query(text: str) -> str:
+    """Для запитів: ще й без регістру і кінцевої пунктуації"""
+    return normalize_text(text).casefold().rstrip("?!.… ")
+
+
+class EmbeddingCacheService:
+    """
+    Персистентний кеш векторів у таблиці embedding_cache. Помилки кешу
+    ніколи не ламають векторизацію - у гіршому разі це просто промах.
+    """
+
+    def key(self, text: str) -> str:
+        raw = f"{settings.EMBEDDING_MODEL}\x1f{settings.EMBEDDING_DIM}\x1f{normalize_text(text)}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    async def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        if not settings.EMBEDDING_CACHE_ENABLED or not keys:
+            return {}
+        try:
+            async with AsyncSessionLocal() as db:
+                found = await crud_embedding_cache.get_many(db, list(set(keys)))
+        except Exception as e:
+            print(f"Embedding cache lookup error: {e}")
+            found = {}
+
+        hits = sum(1 for key in keys if key in found)
+        metrics.inc("embedding_cache_hits", hits)
+        metrics.inc("embedding_cache_misses", len(keys) - hits)
+        return found
+
+    async def put_many(self, items: dict[str, list[float]]):
+        if not settings.EMBEDDING_CACHE_ENABLED or not items:
+            return
+        try:
+            async with AsyncSessionLocal() as db:
+                await crud_embedding_cache.put_many(
+                    db, items, settings.EMBEDDING_MODEL, settings.EMBEDDING_DIM
+                )
+        except Exception as e:
+            print(f"Embedding cache write error: {e}")
+
+    async def evict(self) -> int:
+        async with AsyncSessionLocal() as db:
+            evicted = await crud_embedding_cache.evict_lru(db, settings.EMBEDDING_CACHE_MAX_ROWS)
+        metrics.inc("embedding_cache_evictions", evicted)
+        return evicted
+
+
+class QueryEmbeddingCache:
+    """
+    Кеш векторів запитів чату: LRU+TTL у пам'яті процесу, а за ним (опційно)
+    спільна таблиця query_embedding_cache, щоб влучання бачили всі воркери API.
+    TTL діє і там: запис старший за QUERY_EMBEDDING_CACHE_TTL вважається промахом.
+    Ключ - нормалізоване питання (регістр, пробіли, кінцева пунктуація) і модель,
+    тож "Що таке замикання?" і "що таке  замикання" дають один запит до Gemini.
+    """
+
+    def __init__(self):
+        self._items: OrderedDict[str, tuple[float, list[float]]] = OrderedDict()
+        self._pending: set[asyncio.Task] = set()
+
+    def key(self, query: str) -> str:
+        normalized = normalize_query(query)
+        # окремий простір ключів: вектор тут належить не точному тексту, а класу запитів
+        raw = f"query\x1f{settings.EMBEDDING_MODEL}\x1f{settings.EMBEDDING_DIM}\x1f{normalized}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _get_local(self, key: str) -> list[float] | None:
+        item = self._items.get(key)
+        if item is None:
+            return None
+        expires_at, vector = item
+        if expires_at < time.monotonic():
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return vector
+
+    def _put_local(self, key: str, vector: list[float], age: float = 0.0):
+        ttl = settings.QUERY_EMBEDDING_CACHE_TTL - age
+        self._items[key] = (time.monotonic() + ttl, vector)
+        self._items.move_to_end(key)
+        while len(self._items) > settings.QUERY_EMBEDDING_CACHE_SIZE:
+            self._items.popitem(last=False)
+
+    async def get(self, query: str) -> list[float] | None:
+        if settings.QUERY_EMBEDDING_CACHE_SIZE <= 0:
+            return None
+        key = self.key(query)
+        vector = self._get_local(key)
+        if vector is not None:
+            metrics.inc("query_embedding_cache_hits", tier="memory")
+            return vector
+
+        if settings.QUERY_EMBEDDING_CACHE_SHARED:
+            try:
+                async with AsyncSessionLocal() as db:
+                    found = await crud_embedding_cache.get_query(
+                        db, key, settings.QUERY_EMBEDDING_CACHE_TTL
+                    )
+            except Exception as e:
+                print(f"Query embedding cache lookup error: {e}")
+                found = None
+            if found is not None:
+                vector, age = found
+                metrics.inc("query_embedding_cache_hits", tier="postgres")
+                # у пам'яті живе лише залишок TTL запису з БД
+                self._put_local(key, vector, age)
+                return vector
+
+        metrics.inc("query_embedding_cache_misses")
+        return None
+
+    async def _put_shared(self, key: str, vector: list[float]):
+        try:
+            async with AsyncSessionLocal() as db:
+                await crud_embedding_cache.put_query(
+                    db, key, vector, settings.EMBEDDING_MODEL, settings.EMBEDDING_DIM
+                )
+        except Exception as e:
+            print(f"Query embedding cache write error: {e}")
+
+    async def evict(self) -> int:
+        async with AsyncSessionLocal() as db:
+            evicted = await crud_embedding_cache.evict_queries(
+                db, settings.QUERY_EMBEDDING_CACHE_TTL, settings.QUERY_EMBEDDING_CACHE_MAX_ROWS
+            )
+        metrics.inc("query_embedding_cache_evictions", evicted)
+        return evicted
+
+    def put(self, query: str, vector: list[float]):
+        if settings.QUERY_EMBEDDING_CACHE_SIZE <= 0 or not vector:
+            return
+        key = self.key(query)
+        self._put_local(key, vector)
+        if settings.QUERY_EMBEDDING_CACHE_SHARED:
+            # запис у БД не тримає відповідь чату
+            task = asyncio.create_task(self._put_shared(key, vector))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+
+embedding_cache = EmbeddingCacheService()
+query_embedding_cache = QueryEmbeddingCache()
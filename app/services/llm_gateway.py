@@ -0,0 +1,276 @@
+"""
+Єдина точка доступу до Gemini: один клієнт на процес (спільний пул HTTP-з'єднань),
+таймаути на кожну спробу, ретраї з jitter на 429/5xx і circuit breaker.
+Черга, пріоритети й ліміти паралельності - в app/services/llm_scheduler.py.
+
+При 429 ліміт паралельності моделі зменшується вдвічі й поступово відновлюється
+після успішних відповідей, тож під тиском квоти запити стають у чергу, а не падають
+усі разом.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import nullcontext
+
+import httpx
+from google import genai
+from google.genai import errors, types
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.llm_scheduler import estimate_tokens, llm_scheduler
+
+logger = logging.getLogger("app.llm")
+
+client = genai.Client(api_key=settings.GEMINI_API_KEY)
+
+
+class LLMError(Exception):
+    """Виклик моделі не вдався після всіх спроб"""
+
+
+class LLMUnavailableError(LLMError):
+    """Circuit breaker відкритий: модель тимчасово не викликається"""
+
+
+class _CircuitBreaker:
+    def __init__(self, threshold: int, reset_seconds: float):
+        self.threshold = max(1, threshold)
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probing = False
+
+    def before_call(self):
+        if self.opened_at is None:
+            return
+        if time.monotonic() - self.opened_at < self.reset_seconds or self._probing:
+            raise LLMUnavailableError("LLM circuit is open")
+        # half-open: пропускаємо один пробний запит
+        self._probing = True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+    def release_probe(self):
+        self._probing = False
+
+
+def _status_code(error: Exception) -> int | None:
+    return error.code if isinstance(error, errors.APIError) else None
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, LLMUnavailableError):
+        return False
+    if isinstance(error, TimeoutError | httpx.TransportError):
+        return True
+    code = _status_code(error)
+    return code is not None and (code == 429 or code >= 500)
+
+
+def _backoff(attempt: int) -> float:
+    """Експоненційна затримка з jitter"""
+    delay = min(settings.LLM_RETRY_MAX_DELAY, settings.LLM_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class LLMGateway:
+    def __init__(self):
+        self._breakers: dict[str, _CircuitBreaker] = {}
+
+    def _breaker(self, model: str) -> _CircuitBreaker:
+        if model not in self._breakers:
+            self._breakers[model] = _CircuitBreaker(
+                settings.LLM_BREAKER_THRESHOLD, settings.LLM_BREAKER_RESET_SECONDS
+            )
+        return self._breakers[model]
+
+    async def _call(
+        self,
+        op: str,
+        model: str,
+        lane: str,
+        tokens: int,
+        fn: Callable[[], Awaitable],
+        timeout: float,
+        scheduled: bool = True,
+    ):
+        """
+        Один логічний виклик: слот у планувальнику, breaker і таймаут на кожну спробу,
+        ретраї. scheduled=False - слот уже тримає той, хто викликає (стрім).
+        """
+        breaker = self._breaker(model)
+        started = time.perf_counter()
+        outcome = "error"
+        attempt = 0
+        try:
+            while True:
+                attempt += 1
+                # бюджет смуги списує оцінку один раз на логічний виклик, а не на спробу:
+                # інакше під 429 ретраї вичерпали б смугу саме тоді, коли треба чекати
+                estimate = tokens if attempt == 1 else 0
+                slot = llm_scheduler.slot(model, lane, estimate) if scheduled else nullcontext()
+                async with slot:
+                    try:
+                        breaker.before_call()
+                        async with asyncio.timeout(timeout):
+                            result = await fn()
+                    except asyncio.CancelledError:
+                        breaker.release_probe()
+                        raise
+                    except Exception as e:
+                        self._on_failure(op, model, e, breaker)
+                        if not _is_retryable(e) or attempt >= settings.LLM_MAX_ATTEMPTS:
+                            if isinstance(e, LLMError):
+                                raise
+                            raise LLMError(f"{op} on {model} failed: {e!r}") from e
+                        error = e
+                    else:
+                        breaker.record_success()
+                        llm_scheduler.recover(model)
+                        outcome = "ok"
+                        return result
+
+                delay = _backoff(attempt)
+                metrics.inc("llm_retries", op=op, model=model)
+                logger.warning(
+                    "%s on %s failed (%r), retry %s in %.1fs", op, model, error, attempt, delay
+                )
+                await asyncio.sleep(delay)
+        finally:
+            metrics.inc("llm_requests", op=op, model=model, lane=lane, outcome=outcome)
+            metrics.observe("llm_latency_seconds", time.perf_counter() - started, op=op)
+
+    def _on_failure(self, op: str, model: str, error: Exception, breaker: _CircuitBreaker):
+        if isinstance(error, LLMUnavailableError):
+            metrics.inc("llm_circuit_rejections", model=model)
+            return
+        code = _status_code(error)
+        if code == 429:
+            # квота - це не поломка моделі: зменшуємо паралельність, breaker не чіпаємо
+            llm_scheduler.throttle(model)
+            breaker.release_probe()
+            metrics.inc("llm_throttled", model=model)
+        elif _is_retryable(error):
+            breaker.record_failure()
+        else:
+            breaker.release_probe()
+        logger.debug("%s on %s: %r", op, model, error)
+
+    @staticmethod
+    def _charge_usage(lane: str, response, estimated: int):
+        usage = getattr(response, "usage_metadata", None)
+        if usage and usage.total_token_count:
+            llm_scheduler.charge(lane, usage.total_token_count - estimated)
+
+    async def generate(self, prompt: str, model: str | None = None, lane: str = "chat") -> str:
+        model = model or settings.GEMINI_MODEL
+        tokens = estimate_tokens(prompt)
+
+        async def call():
+            response = await client.aio.models.generate_content(model=model, contents=prompt)
+            self._charge_usage(lane, response, tokens)
+            return response.text or ""
+
+        return await self._call(
+            "generate", model, lane, tokens, call, settings.LLM_GENERATE_TIMEOUT
+        )
+
+    async def generate_json(
+        self, prompt: str, schema, model: str | None = None, lane: str = "chat"
+    ):
+        """Структурована відповідь за pydantic-схемою"""
+        model = model or settings.GEMINI_MODEL
+        tokens = estimate_tokens(prompt)
+        config = types.GenerateContentConfig(
+            response_mime_type="application/json", response_schema=schema
+        )
+
+        async def call():
+            response = await client.aio.models.generate_content(
+                model=model, contents=prompt, config=config
+            )
+            self._charge_usage(lane, response, tokens)
+            if response.parsed is None:
+                raise LLMError("Model returned no structured output")
+            return response.parsed
+
+        return await self._call(
+            "generate_json", model, lane, tokens, call, settings.LLM_GENERATE_TIMEOUT
+        )
+
+    async def stream(
+        self, prompt: str, model: str | None = None, lane: str = "chat"
+    ) -> AsyncIterator[str]:
+        """
+        Віддає текст відповіді шматками. Ретраї лише до першого шматка:
+        після того, як клієнт щось отримав, повторювати запит вже не можна.
+        """
+        model = model or settings.GEMINI_MODEL
+        tokens = estimate_tokens(prompt)
+
+        async def open_stream():
+            response = await client.aio.models.generate_content_stream(model=model, contents=prompt)
+            iterator = aiter(response)
+            return iterator, await anext(iterator, None)
+
+        # слот тримається весь стрім, а не лише відкриття: ліміт моделі й AIMD
+        # обмежують саме активні генерації; ретраїться тільки відкриття
+        async with llm_scheduler.slot(model, lane, tokens):
+            iterator, chunk = await self._call(
+                "stream",
+                model,
+                lane,
+                tokens,
+                open_stream,
+                settings.LLM_STREAM_IDLE_TIMEOUT,
+                scheduled=False,
+            )
+            last = chunk
+            try:
+                while chunk is not None:
+                    last = chunk
+                    if chunk.text:
+                        yield chunk.text
+                    try:
+                        async with asyncio.timeout(settings.LLM_STREAM_IDLE_TIMEOUT):
+                            chunk = await anext(iterator, None)
+                    except Exception as e:
+                        self._breaker(model).record_failure()
+                        metrics.inc("llm_stream_interrupted", model=model)
+                        raise LLMError(f"stream on {model} interrupted: {e!r}") from e
+            finally:
+                # usage_metadata з фінальним підсумком приходить в останньому шматку
+                self._charge_usage(lane, last, tokens)
+                if hasattr(iterator, "aclose"):
+                    await iterator.aclose()
+
+    async def embed(
+        self, texts: list[str], model: str | None = None, lane: str = "ingestion"
+    ) -> list[list[float]]:
+        model = model or settings.EMBEDDING_MODEL
+        tokens = estimate_tokens(*texts)
+        config = types.EmbedContentConfig(output_dimensionality=settings.EMBEDDING_DIM)
+
+        async def call():
+            result = await client.aio.models.embed_content(
+                model=model, contents=texts, config=config
+            )
+            return [embedding.values for embedding in result.embeddings]
+
+        return await self._call("embed", model, lane, tokens, call, settings.LLM_EMBED_TIMEOUT)
+
+
+llm_gateway = LLMGateway()
@@ -0,0 +1,171 @@
+"""
+Пріоритетний планувальник викликів моделі: живий чат першим, інструменти
+навчання другими, масова векторизація документів останньою.
+
+Кожен виклик проходить три ворота:
+1. слот своєї смуги (LLM_LANE_CONCURRENCY) - одна смуга не займе все;
+2. бюджет токенів смуги на хвилину (LLM_LANE_TOKENS_PER_MINUTE, 0 - без ліміту);
+3. слот моделі - коли він звільняється, його отримує найпріоритетніший
+   з тих, хто чекає, а не той, хто прийшов раніше.
+
+Усе це стан одного процесу: пріоритети діють між викликами всередині API
+або всередині воркера, але не між ними. Щоб фонові задачі не з'їли квоту
+моделі, воркер запускається з жорсткими стелями WORKER_LLM_* (app/worker.py).
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+# менше число - вищий пріоритет
+LANES = {"chat": 0, "study": 1, "ingestion": 2}
+
+
+def estimate_tokens(*texts: str) -> int:
+    """Груба оцінка (~4 символи на токен), точна кількість приходить у відповіді"""
+    return max(1, sum(len(text) for text in texts) // 4)
+
+
+class _ModelLimiter:
+    """Семафор зі змінним лімітом (AIMD за сигналами 429) і чергою за пріоритетом"""
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = self.max_concurrency
+        self.active = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+
+    @asynccontextmanager
+    async def slot(self, priority: int):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._order), waiter))
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # слот могли видати якраз перед скасуванням - повертаємо його
+                if waiter.done() and not waiter.cancelled():
+                    self._release()
+                raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self):
+        self.active -= 1
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.active < self.limit:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if waiter.done():
+                continue
+            self.active += 1
+            waiter.set_result(None)
+
+    def throttle(self):
+        self.limit = max(1, self.limit // 2)
+
+    def recover(self):
+        if self.limit < self.max_concurrency:
+            self.limit += 1
+            self._wake()
+
+
+class _TokenBudget:
+    """Token bucket на хвилину; баланс може піти в мінус після точного обліку"""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = tokens_per_minute
+        self.tokens = float(tokens_per_minute)
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.capacity / 60)
+        self.updated_at = now
+
+    async def take(self, tokens: int):
+        if self.capacity <= 0 or tokens <= 0:
+            return
+        # запит більший за весь бюджет інакше чекав би вічно
+        tokens = min(tokens, self.capacity)
+        self._refill()
+        while self.tokens < tokens:
+            await asyncio.sleep((tokens - self.tokens) * 60 / self.capacity)
+            self._refill()
+        self.tokens -= tokens
+
+    def charge(self, tokens: int):
+        if self.capacity > 0:
+            self._refill()
+            self.tokens -= tokens
+
+
+class LLMScheduler:
+    def __init__(self):
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._models: dict[str, _ModelLimiter] = {}
+        self._lanes: dict[str, asyncio.Semaphore] = {}
+        self._budgets: dict[str, _TokenBudget] = {}
+
+    def _check_loop(self):
+        # примітиви asyncio прив'язуються до циклу подій, тому на новий цикл - нові
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._models.clear()
+            self._lanes.clear()
+
+    def _model(self, model: str) -> _ModelLimiter:
+        if model not in self._models:
+            self._models[model] = _ModelLimiter(settings.LLM_MAX_CONCURRENCY)
+        return self._models[model]
+
+    def _lane(self, lane: str) -> asyncio.Semaphore:
+        if lane not in self._lanes:
+            limit = settings.LLM_LANE_CONCURRENCY.get(lane, settings.LLM_MAX_CONCURRENCY)
+            self._lanes[lane] = asyncio.Semaphore(max(1, limit))
+        return self._lanes[lane]
+
+    def _budget(self, lane: str) -> _TokenBudget:
+        if lane not in self._budgets:
+            self._budgets[lane] = _TokenBudget(settings.LLM_LANE_TOKENS_PER_MINUTE.get(lane, 0))
+        return self._budgets[lane]
+
+    @asynccontextmanager
+    async def slot(self, model: str, lane: str, tokens: int):
+        if lane not in LANES:
+            raise ValueError(f"Unknown LLM lane: {lane}")
+        self._check_loop()
+        started = time.perf_counter()
+        async with self._lane(lane):
+            await self._budget(lane).take(tokens)
+            if tokens:
+                metrics.inc("llm_tokens", tokens, lane=lane)
+            async with self._model(model).slot(LANES[lane]):
+                metrics.observe("llm_queue_wait_seconds", time.perf_counter() - started, lane=lane)
+                yield
+
+    def charge(self, lane: str, tokens: int):
+        """Дораховує різницю між оцінкою і фактичним usage з відповіді"""
+        self._budget(lane).charge(tokens)
+        metrics.inc("llm_tokens", tokens, lane=lane)
+
+    def throttle(self, model: str):
+        self._model(model).throttle()
+
+    def recover(self, model: str):
+        self._model(model).recover()
+
+
+llm_scheduler = LLMScheduler()
@@ -1,11 +1,20 @@
+import multiprocessing
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
 
 from pypdf import PdfReader
 
+from app.core.config import settings
+
 
 class PDFService:
+    _pool: ProcessPoolExecutor | None = None
+
     @staticmethod
-    def extract_text(pdf_path: str):
+    def _check_path(pdf_path: str) -> Path:
         path = Path(pdf_path)
 
         if not path.is_file():
@@ -15,17 +24,64 @@ class PDFService:
 
         if extension != ".pdf":
             raise FileExistsError("Extension not supported")
+        return path
+
+    @staticmethod
+    def _extract_range(pdf_path: str, start: int, stop: int) -> list[tuple[int, str]]:
+        """Витягує текст сторінок [start, stop); виконується і в дочірніх процесах"""
+        reader = PdfReader(pdf_path)
+        pages = []
+        for index in range(start, min(stop, len(reader.pages))):
+            pages.append((index + 1, reader.pages[index].extract_text() or ""))
+        return pages
+
+    @classmethod
+    def _get_pool(cls, workers: int) -> ProcessPoolExecutor:
+        # spawn, бо fork з процесу з потоками asyncio може зависнути
+        if cls._pool is None:
+            cls._pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return cls._pool
+
+    def iter_pages(self, pdf_path: str, workers: int | None = None) -> Iterator[tuple[int, str]]:
+        """
+        Ліниво віддає (номер сторінки з 1, текст) у порядку сторінок.
+        При workers > 1 діапазони сторінок розподіляються між процесами пулу;
+        в польоті тримається не більше 2 * workers діапазонів, щоб пам'ять
+        не росла з розміром документа.
+        """
+        path = str(self._check_path(pdf_path))
+        workers = settings.PDF_EXTRACT_WORKERS if workers is None else workers
+        per_task = max(1, settings.PDF_PAGES_PER_TASK)
+
         try:
-            reader = PdfReader(str(path))
-
-            text = ""
-            for page in reader.pages:
-                extracted_text = page.extract_text()
-                if extracted_text:
-                    text += extracted_text
-            return text
+            reader = PdfReader(path)
+            page_count = len(reader.pages)
+            if workers <= 1 or page_count <= per_task:
+                for index, page in enumerate(reader.pages):
+                    yield index + 1, page.extract_text() or ""
+                return
+
+            pool = self._get_pool(workers)
+            starts = iter(range(0, page_count, per_task))
+            window = deque(
+                pool.submit(self._extract_range, path, start, start + per_task)
+                for start in islice(starts, 2 * workers)
+            )
+            while window:
+                pages = window.popleft().result()
+                for start in islice(starts, 1):
+                    window.append(pool.submit(self._extract_range, path, start, start + per_task))
+                yield from pages
         except Exception as e:
             raise ValueError(f"Failed to extract text: {e}") from e
 
+    def extract_pages(self, pdf_path: str, workers: int | None = None) -> list[tuple[int, str]]:
+        return list(self.iter_pages(pdf_path, workers))
+
+    def extract_text(self, pdf_path: str) -> str:
+        return "".join(text for _, text in self.extract_pages(pdf_path))
+
 
 pdf_service = PDFService()
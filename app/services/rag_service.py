@@ -1,86 +1,233 @@
 import asyncio
 import re
+import threading
+from collections.abc import Iterable, Iterator
 
-from google import genai
-from google.genai import types
-from sqlalchemy import select
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
 from app.core.db import AsyncSessionLocal
+from app.crud import chat as crud_chat
+from app.crud import chunk as crud_chunk
+from app.crud import document as crud_document
+from app.crud import study_cache as crud_study_cache
 from app.models.document import Document, DocumentChunk
+from app.services.embedding_cache import embedding_cache, query_embedding_cache
+from app.services.llm_gateway import llm_gateway
 from app.services.pdf_service import pdf_service
 
-client = genai.Client(api_key=settings.GEMINI_API_KEY)
-
 
 class RagService:
-    def _semantic_chunking(self, text: str, max_size: int = 1000, overlap: int  = 150 ) -> list[str]:
-        segments = re.split(r"(?<=[.!?])\s+|\n\n+", text)
-        chunks = []
-        current_chunk = []
+    def _iter_chunks(
+        self, pages: Iterable[tuple[int, str]], max_size: int = 1000, overlap: int = 150
+    ) -> Iterator[tuple[int, str]]:
+        """Потоково ріже сторінки на чанки, віддає (сторінка початку чанку, текст)"""
+        current_chunk: list[tuple[int, str]] = []
         current_length = 0
 
-        for segment in segments:
-            segment = segment.strip()
-            if not segment:
-                continue
+        for page_number, page_text in pages:
+            for segment in re.split(r"(?<=[.!?])\s+|\n\n+", page_text):
+                segment = segment.strip()
+                if not segment:
+                    continue
 
-            segment_len = len(segment)
+                segment_len = len(segment)
 
-            if segment_len > max_size:
-                if current_chunk:
-                    chunks.append(" ".join(current_chunk))
-                    current_chunk = []
-                    current_length = 0
+                if segment_len > max_size:
+                    if current_chunk:
+                        yield current_chunk[0][0], " ".join(s for _, s in current_chunk)
+                        current_chunk = []
+                        current_length = 0
 
-                for i in range(0, segment_len, max_size - overlap):
-                    chunks.append(segment[i : i + max_size])
-                continue
+                    for i in range(0, segment_len, max_size - overlap):
+                        yield page_number, segment[i : i + max_size]
+                    continue
 
-            if current_length + segment_len + 1 > max_size and current_chunk:
-                chunks.append(" ".join(current_chunk))
+                if current_length + segment_len + 1 > max_size and current_chunk:
+                    yield current_chunk[0][0], " ".join(s for _, s in current_chunk)
 
-                overlap_length = 0
-                overlap_chunk = []
-                for s in reversed(current_chunk):
-                    if overlap_length + len(s) <= overlap:
-                        overlap_chunk.insert(0, s)
-                        overlap_length += len(s) + 1
-                    else:
-                        break
+                    overlap_length = 0
+                    overlap_chunk = []
+                    for item in reversed(current_chunk):
+                        if overlap_length + len(item[1]) <= overlap:
+                            overlap_chunk.insert(0, item)
+                            overlap_length += len(item[1]) + 1
+                        else:
+                            break
 
-                current_chunk = overlap_chunk
-                current_length = sum(len(s) + 1 for s in current_chunk)
+                    current_chunk = overlap_chunk
+                    current_length = sum(len(s) + 1 for _, s in current_chunk)
 
-            current_chunk.append(segment)
-            current_length += segment_len + 1
+                current_chunk.append((page_number, segment))
+                current_length += segment_len + 1
 
         if current_chunk:
-            chunks.append(" ".join(current_chunk))
-
-        return chunks
-
-
-
-
+            yield current_chunk[0][0], " ".join(s for _, s in current_chunk)
 
+    def _semantic_chunking(self, text: str, max_size: int = 1000, overlap: int = 150) -> list[str]:
+        return [chunk for _, chunk in self._iter_chunks([(1, text)], max_size, overlap)]
 
-    def get_embedding(self, text: str) -> list[float]:
+    async def get_embeddings(self, texts: list[str], lane: str = "ingestion") -> list[list[float]]:
+        """Векторизує кілька текстів одним запитом, порядок векторів = порядок текстів"""
         try:
-            # Використовуємо text-embedding
-            result = client.models.embed_content(
-                model="gemini-embedding-001",
-                contents=text,
-                config=types.EmbedContentConfig(output_dimensionality=768),
-            )
-            print("Result:", result)
-
-            return result.embeddings[0].values
+            return await llm_gateway.embed(texts, lane=lane)
         except Exception as e:
             print(f"Gemini API Error: {e}")
             return []
 
-    async def process_document(self, document_id: int):
+    async def get_embedding(self, text: str) -> list[float]:
+        """Вектор запиту користувача - з кешу або через пріоритетну смугу чату"""
+        cached = await query_embedding_cache.get(text)
+        if cached is not None:
+            return cached
+        vectors = await self.get_embeddings([text], lane="chat")
+        if not vectors:
+            return []
+        query_embedding_cache.put(text, vectors[0])
+        return vectors[0]
+
+    async def _embed_batch(
+        self, batch: list[str], semaphore: asyncio.Semaphore
+    ) -> list[list[float]]:
+        """Бере вектори з кешу, у Gemini йдуть лише промахи"""
+        keys = [embedding_cache.key(text) for text in batch]
+        vectors = await embedding_cache.get_many(keys)
+
+        missing: dict[str, str] = {}
+        for key, text in zip(keys, batch, strict=True):
+            if key not in vectors:
+                missing.setdefault(key, text)
+
+        if missing:
+            async with semaphore:
+                fresh = await self.get_embeddings(list(missing.values()))
+            if len(fresh) == len(missing):
+                new_items = dict(zip(missing, fresh, strict=True))
+                await embedding_cache.put_many(new_items)
+                vectors.update(new_items)
+
+        return [vectors.get(key, []) for key in keys]
+
+    async def embed_chunks(self, chunks: list[str]) -> list[list[float]]:
+        """
+        Векторизує чанки батчами по EMBED_BATCH_SIZE, тримаючи в польоті
+        не більше EMBED_CONCURRENCY батчів. Результат вирівняний з chunks,
+        для батчів, що впали, повертаються порожні вектори.
+        """
+        batch_size = max(1, settings.EMBED_BATCH_SIZE)
+        semaphore = asyncio.Semaphore(max(1, settings.EMBED_CONCURRENCY))
+
+        batches = [chunks[i : i + batch_size] for i in range(0, len(chunks), batch_size)]
+        results = await asyncio.gather(*(self._embed_batch(batch, semaphore) for batch in batches))
+        return [vector for batch_vectors in results for vector in batch_vectors]
+
+    async def _ingest_stream(self, db: AsyncSession, document_id: int, file_path: str):
+        """
+        Конвеєр сторінки -> сегменти -> чанки -> батчі векторизації -> батчі БД.
+
+        Витяг і нарізка йдуть в окремому потоці й блокуються, коли черга повна
+        (backpressure). Одночасно між PDF і буфером запису живе не більше
+        INGEST_MAX_CHUNKS_IN_FLIGHT чанків, а буфер скидається в БД кожні
+        CHUNK_WRITE_BATCH_SIZE рядків, тому пам'ять не залежить від розміру
+        документа. Кожен скинутий батч комітиться й одразу доступний для пошуку.
+
+        Повертає (скільки чанків нарізано, скільки збережено).
+        """
+        loop = asyncio.get_running_loop()
+        batch_size = max(1, settings.EMBED_BATCH_SIZE)
+        batches: asyncio.Queue = asyncio.Queue(maxsize=1)
+        batch_slots = asyncio.Semaphore(max(1, settings.INGEST_MAX_CHUNKS_IN_FLIGHT // batch_size))
+        embed_slots = asyncio.Semaphore(max(1, settings.EMBED_CONCURRENCY))
+        write_lock = asyncio.Lock()
+        stop = threading.Event()
+        write_buffer: list[crud_chunk.ChunkRow] = []
+        produced = 0
+        saved = 0
+
+        def put(item) -> bool:
+            future = asyncio.run_coroutine_threadsafe(batches.put(item), loop)
+            while not stop.is_set():
+                try:
+                    future.result(timeout=0.5)
+                    return True
+                except TimeoutError:
+                    continue
+            future.cancel()
+            return False
+
+        def produce():
+            nonlocal produced
+            batch = []
+            try:
+                chunks = self._iter_chunks(pdf_service.iter_pages(file_path))
+                for page_number, chunk_text in chunks:
+                    if len(chunk_text) <= 50:
+                        continue
+                    batch.append((produced, page_number, chunk_text))
+                    produced += 1
+                    if len(batch) == batch_size:
+                        if not put(batch):
+                            return
+                        batch = []
+                if batch:
+                    put(batch)
+            finally:
+                # сигнал кінця потоку; помилку витягу отримаємо з await producer
+                put(None)
+
+        async def flush():
+            nonlocal saved, write_buffer
+            rows, write_buffer = write_buffer, []
+            if rows:
+                saved += await crud_chunk.write_chunks(db, rows)
+
+        async def embed_and_write(batch):
+            try:
+                vectors = await self._embed_batch([text for _, _, text in batch], embed_slots)
+                rows = [
+                    (document_id, idx, page_number, chunk_text, vector)
+                    for (idx, page_number, chunk_text), vector in zip(batch, vectors, strict=True)
+                    if vector
+                ]
+                async with write_lock:
+                    write_buffer.extend(rows)
+                    if len(write_buffer) >= settings.CHUNK_WRITE_BATCH_SIZE:
+                        await flush()
+            finally:
+                batch_slots.release()
+
+        producer = asyncio.create_task(asyncio.to_thread(produce))
+        tasks: set[asyncio.Task] = set()
+        try:
+            while (batch := await batches.get()) is not None:
+                await batch_slots.acquire()
+                for task in [t for t in tasks if t.done()]:
+                    tasks.discard(task)
+                    task.result()  # прокидаємо помилку запису якомога раніше
+                tasks.add(asyncio.create_task(embed_and_write(batch)))
+            await asyncio.gather(*tasks)
+            await producer
+            async with write_lock:
+                await flush()
+        finally:
+            stop.set()
+            for task in tasks:
+                task.cancel()
+            # звільняємо producer, якщо він чекає на місце в черзі
+            while not batches.empty():
+                batches.get_nowait()
+            await asyncio.gather(producer, *tasks, return_exceptions=True)
+
+        return produced, saved
+
+    async def process_document(self, document_id: int, final_attempt: bool = True):
+        """
+        Обробляє документ: текст -> чанки -> вектори -> БД.
+        Ідемпотентна, тому воркер може безпечно повторювати її. Тимчасові
+        помилки прокидаються нагору, щоб задачу можна було повторити;
+        документ позначається failed лише на останній спробі.
+        """
         async with AsyncSessionLocal() as db:
             print(f"---Start processing document ID {document_id} ---")
 
@@ -95,53 +242,64 @@ class RagService:
             # Ці статуси потрібні для того, щоб UI розумів коли бд вже зберегла усі чанки і готова обробляти їх
             # 1. Починаємо обробку: статус "processing"
             document.processing_status = "processing"
+            await db.execute(delete(DocumentChunk).where(DocumentChunk.document_id == document.id))
             await db.commit()
 
             try:
-                full_text = await asyncio.to_thread(pdf_service.extract_text, document.file_path)
-
-                if not full_text:
-                    print(f"Document {document.id} has no text")
-                    # Помилка: пустий текст
-                    document.processing_status = "failed"
-                    await db.commit()
-                    return
-
-                chunk_size = 1000
-                overlap = 150
-
-                raw_chunks = self._semantic_chunking(full_text, max_size = chunk_size, overlap=overlap)
-
-                chunks = [c for c in raw_chunks if len(c) > 50]
-                print(f"Created {len(chunks)} chunks. Vectorizing...")
-
-                new_chunks = []
-                for idx, chunk_text in enumerate(chunks):
-                    vector = await asyncio.to_thread(self.get_embedding, chunk_text)
-
-                    if vector:
-                        db_chunk = DocumentChunk(
-                            document_id=document.id,
-                            chunk_index=idx,
-                            chunk_text=chunk_text,
-                            embedding=vector,
+                if document.content_hash:
+                    # такий самий файл уже оброблено - копіюємо готові чанки з векторами
+                    source = await crud_document.get_by_content_hash(
+                        db, document.content_hash, exclude_id=document.id, status="completed"
+                    )
+                    if source and await crud_chunk.clone_chunks(db, source.id, document.id):
+                        await crud_study_cache.invalidate_for_document(
+                            db, document.project_id, document.id
                         )
-                        new_chunks.append(db_chunk)
-
-                if new_chunks:
-                    db.add_all(new_chunks)
+                        await crud_chat.invalidate_answer_cache(db, document.project_id)
+                        document.processing_status = "completed"
+                        await db.commit()
+                        print(f" Reused chunks of identical document {source.id}")
+                        return
+
+                produced, saved = await self._ingest_stream(db, document.id, document.file_path)
+
+                if 0 < saved < produced:
+                    # частина батчів не векторизувалась - без них пошук мовчки неповний;
+                    # повтор задачі візьме вже готові вектори з embedding_cache
+                    raise RuntimeError(
+                        f"Embedding failed for {produced - saved} of {produced} chunks"
+                    )
+                if saved:
+                    # чанки документа змінились - результати study на ньому застаріли
+                    await crud_study_cache.invalidate_for_document(
+                        db, document.project_id, document.id
+                    )
+                    await crud_chat.invalidate_answer_cache(db, document.project_id)
                     document.processing_status = "completed"
                     await db.commit()
-                    print(f" Successfully saved {len(new_chunks)} chunks")
+                    print(f" Successfully saved {saved} chunks")
+                elif produced:
+                    # чанки є, але жоден не векторизувався - найімовірніше, збій Gemini
+                    raise RuntimeError("Embedding failed for every chunk")
                 else:
-                    print(" No chunks were created/saved")
+                    print(f"Document {document.id} has no text")
                     document.processing_status = "failed"
                     await db.commit()
 
             except Exception as e:
                 print(f"❌ Error processing document: {e}")
-                document.processing_status = "failed"
+                await db.rollback()
+                # частково збережені чанки прибираємо, повторна спроба почне з нуля
+                await db.execute(
+                    delete(DocumentChunk).where(DocumentChunk.document_id == document_id)
+                )
+                await db.execute(
+                    update(Document)
+                    .where(Document.id == document_id)
+                    .values(processing_status="failed" if final_attempt else "pending")
+                )
                 await db.commit()
+                raise
 
 
 rag_service = RagService()
@@ -0,0 +1,228 @@
+import asyncio
+from math import inf
+from typing import NamedTuple
+
+from sqlalchemy import Float, cast, literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.crud import chunk as crud_chunk
+from app.models.document import Document, DocumentChunk
+
+
+class RetrievedChunk(NamedTuple):
+    id: int
+    chunk_text: str
+    filename: str
+
+
+class RetrievalService:
+    """Гібридний пошук: вектор (pgvector) + ключові слова (tsvector), злиття через RRF"""
+
+    VECTOR_LIMIT = 5
+    KEYWORD_LIMIT = 10
+
+    RRF_K = 60
+    RRF_W_VEC = 1.0
+    RRF_W_KW = 0.8
+
+    def _rrf_merge(
+        self, vector_results, keyword_results, k=RRF_K, w_vec=RRF_W_VEC, w_kw=RRF_W_KW, top_n=20
+    ):
+        scores = {}
+
+        def add(results, weight):
+            for rank, item in enumerate(results):
+                entry = scores.get(item.id)
+                if entry is None:
+                    entry = {"item": item, "score": 0.0, "best_rank": inf}
+                    scores[item.id] = entry
+
+                entry["score"] += weight / (k + rank + 1)
+                if rank < entry["best_rank"]:
+                    entry["best_rank"] = rank
+
+        add(vector_results, w_vec)
+        add(keyword_results, w_kw)
+
+        # sort by: score desc, best_rank asc, id asc
+
+        sorted_entries = sorted(
+            scores.items(),
+            key=lambda kv: (-kv[1]["score"], kv[1]["best_rank"], kv[0]),
+        )
+
+        return [entry["item"] for _, entry in sorted_entries[:top_n]]
+
+    @staticmethod
+    def _ts_query(query_text: str):
+        return func.websearch_to_tsquery("simple", query_text)
+
+    @staticmethod
+    def _ts_rank(query_text: str):
+        return func.ts_rank(DocumentChunk.content_tsvector, RetrievalService._ts_query(query_text))
+
+    def _candidate_columns(self):
+        # лише те, що потрібно для відповіді: без embedding (~6 КБ на рядок) і tsvector
+        return select(DocumentChunk.id, DocumentChunk.chunk_text, Document.filename).join(Document)
+
+    @staticmethod
+    def _scope(stmt, project_id: int, document_ids: list[int] | None):
+        stmt = stmt.filter(Document.project_id == project_id)
+        if document_ids:
+            stmt = stmt.filter(Document.id.in_(document_ids))
+        return stmt
+
+    async def _python_hybrid(
+        self,
+        project_id: int,
+        query_text: str,
+        query_vector,
+        top_n: int,
+        document_ids: list[int] | None = None,
+        ef_search: int | None = None,
+    ) -> list[RetrievedChunk]:
+        """
+        Два окремі запити паралельно, злиття в Python. Кожен - у своїй короткій
+        сесії, а не в сесії виклику: інакше паралельні пошуки тримали б з'єднання
+        і чекали на друге, поки пул не вичерпається.
+        """
+        vector_stmt = (
+            self._scope(self._candidate_columns(), project_id, document_ids)
+            .order_by(DocumentChunk.embedding.l2_distance(query_vector))
+            .limit(self.VECTOR_LIMIT)
+        )
+
+        keyword_stmt = (
+            self._scope(self._candidate_columns(), project_id, document_ids)
+            .filter(DocumentChunk.content_tsvector.op("@@")(self._ts_query(query_text)))
+            .order_by(self._ts_rank(query_text).desc(), DocumentChunk.id)
+            .limit(self.KEYWORD_LIMIT)
+        )
+
+        async def run(stmt, ef_search: int | None = None):
+            async with AsyncSessionLocal() as db:
+                if ef_search is not None:
+                    await crud_chunk.set_vector_search_params(db, ef_search)
+                return [RetrievedChunk(*row) for row in (await db.execute(stmt)).all()]
+
+        vector_chunks, keyword_chunks = await asyncio.gather(
+            run(vector_stmt, ef_search), run(keyword_stmt)
+        )
+
+        return self._rrf_merge(vector_chunks, keyword_chunks, top_n=top_n)
+
+    def _rrf_score(self, weight: float, rank):
+        # row_number з 1, тому weight / (k + rank) == weight / (k + rank0 + 1) з _rrf_merge
+        return (literal(weight, Float) / cast(rank + self.RRF_K, Float)).label("score")
+
+    async def _sql_hybrid(
+        self,
+        db: AsyncSession,
+        project_id: int,
+        query_text: str,
+        query_vector,
+        top_n: int,
+        document_ids: list[int] | None = None,
+    ) -> list[RetrievedChunk]:
+        """
+        Обидва списки кандидатів і RRF в одному запиті (CTE). Ранги, ваги й
+        порядок при рівності ті самі, що в _rrf_merge, тож результат збігається.
+        """
+        distance = DocumentChunk.embedding.l2_distance(query_vector)
+        # LIMIT у підзапиті, а row_number зовні - інакше вікно зламає використання HNSW
+        vector_candidates = (
+            self._scope(
+                select(DocumentChunk.id, distance.label("distance")).join(Document),
+                project_id,
+                document_ids,
+            )
+            .order_by(distance)
+            .limit(self.VECTOR_LIMIT)
+            .subquery("vector_candidates")
+        )
+        vector_ranked = select(
+            vector_candidates.c.id,
+            func.row_number().over(order_by=vector_candidates.c.distance).label("rank"),
+        ).cte("vector_ranked")
+
+        ts_rank = self._ts_rank(query_text)
+        keyword_candidates = (
+            self._scope(
+                select(DocumentChunk.id, ts_rank.label("ts_rank")).join(Document),
+                project_id,
+                document_ids,
+            )
+            .filter(DocumentChunk.content_tsvector.op("@@")(self._ts_query(query_text)))
+            .order_by(ts_rank.desc(), DocumentChunk.id)
+            .limit(self.KEYWORD_LIMIT)
+            .subquery("keyword_candidates")
+        )
+        keyword_ranked = select(
+            keyword_candidates.c.id,
+            func.row_number()
+            .over(order_by=(keyword_candidates.c.ts_rank.desc(), keyword_candidates.c.id))
+            .label("rank"),
+        ).cte("keyword_ranked")
+
+        scored = union_all(
+            select(
+                vector_ranked.c.id,
+                self._rrf_score(self.RRF_W_VEC, vector_ranked.c.rank),
+                vector_ranked.c.rank,
+            ),
+            select(
+                keyword_ranked.c.id,
+                self._rrf_score(self.RRF_W_KW, keyword_ranked.c.rank),
+                keyword_ranked.c.rank,
+            ),
+        ).subquery("scored")
+        fused = (
+            select(
+                scored.c.id,
+                func.sum(scored.c.score).label("score"),
+                func.min(scored.c.rank).label("best_rank"),
+            )
+            .group_by(scored.c.id)
+            .cte("fused")
+        )
+
+        stmt = (
+            select(DocumentChunk.id, DocumentChunk.chunk_text, Document.filename)
+            .select_from(fused)
+            .join(DocumentChunk, DocumentChunk.id == fused.c.id)
+            .join(Document, Document.id == DocumentChunk.document_id)
+            .order_by(fused.c.score.desc(), fused.c.best_rank, fused.c.id)
+            .limit(top_n)
+        )
+        result = await db.execute(stmt)
+        return [RetrievedChunk(*row) for row in result.all()]
+
+    async def hybrid_search(
+        self,
+        db: AsyncSession,
+        project_id: int,
+        query_text: str,
+        query_vector,
+        top_n: int = 20,
+        ef_search: int | None = None,
+        document_ids: list[int] | None = None,
+    ) -> list[RetrievedChunk]:
+        """
+        document_ids - шукати лише в цих документах проекту. У режимі python
+        db не використовується: обидва запити беруть власні короткі сесії.
+        """
+        if ef_search == settings.HNSW_EF_SEARCH:
+            ef_search = None
+        if settings.HYBRID_SEARCH_MODE != "sql":
+            return await self._python_hybrid(
+                project_id, query_text, query_vector, top_n, document_ids, ef_search
+            )
+        if ef_search is not None:
+            await crud_chunk.set_vector_search_params(db, ef_search)
+        return await self._sql_hybrid(db, project_id, query_text, query_vector, top_n, document_ids)
+
+
+retrieval_service = RetrievalService()
@@ -1,206 +1,536 @@
+import asyncio
+import hashlib
 import json
+import time
+from collections.abc import Awaitable, Callable
 
-from google import genai
-from google.genai import types
 from pydantic import BaseModel
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
 
 from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.core.metrics import metrics
 from app.core.prompts import StudyPrompts
-from app.models.analysis import ProjectAnalysis, ProjectAnalysisItem
+from app.crud import study_cache as crud_study_cache
 from app.models.document import Document, DocumentChunk
 from app.schemas.study import ExamResponse, KeyPointsResponse, UserQuestionsResponse
+from app.services.llm_gateway import llm_gateway
+from app.services.rag_service import rag_service
+from app.services.retrieval_service import RetrievedChunk, retrieval_service
+from app.utils.advisory_lock import try_advisory_lock
 
-# Ініціалізація клієнта
-client = genai.Client(api_key=settings.GEMINI_API_KEY)
+# колбек прогресу фонової задачі: (відсоток 0-100, повідомлення)
+Progress = Callable[[int, str], Awaitable[None]]
 
 
 class StudyService:
-    # --- HELPER METHODS ---
+    CONTEXT_MAX_CHARS = 200_000
+    NO_TEXT_MESSAGE = "Текст відсутній."
+    NO_CONTEXT_MESSAGE = "Немає контексту."
+    GENERATION_ERROR_MESSAGE = "Виникла помилка при генерації."
+    # заглушки замість відповіді моделі: порівнюються повністю, а не за підрядком
+    FALLBACK_MESSAGES = frozenset({NO_TEXT_MESSAGE, NO_CONTEXT_MESSAGE, GENERATION_ERROR_MESSAGE})
+    CONTEXT_FETCH_ROWS = 200
 
-    def _get_docs_hash(self, documents_ids: list[int]) -> str:
-        """Створює унікальний підпис для набору файлів"""
-        return ",".join(map(str, sorted(documents_ids)))
+    def __init__(self):
+        self._in_flight: dict[str, asyncio.Task] = {}
 
-    async def _get_context(
-        self, db: AsyncSession, project_id: int, document_ids: list[int] | None = None
-    ) -> str:
-        """Витягує текст з бази"""
+    # --- HELPER METHODS ---
+
+    async def _stream_context(
+        self,
+        db: AsyncSession,
+        project_id: int,
+        document_ids: list[int] | None,
+        max_chars: int,
+    ) -> tuple[str, bool]:
+        """
+        Читає чанки серверним курсором пачками по CONTEXT_FETCH_ROWS і зупиняється,
+        щойно набрано max_chars, тож пам'ять і трафік обмежені бюджетом, а не
+        розміром проекту. Друге значення - True, якщо текст не вмістився.
+        """
         stmt = (
             select(DocumentChunk.chunk_text)
             .join(Document)
             .filter(Document.project_id == project_id)
             .order_by(Document.id, DocumentChunk.chunk_index)
+            .execution_options(yield_per=self.CONTEXT_FETCH_ROWS)
         )
         if document_ids:
             stmt = stmt.filter(Document.id.in_(document_ids))
 
-        result = await db.execute(stmt)
-        chunks = result.scalars().all()
+        parts: list[str] = []
+        size = 0
+        result = await db.stream_scalars(stmt)
+        try:
+            async for chunk_text in result:
+                if parts:
+                    chunk_text = "\n\n" + chunk_text
+                if size + len(chunk_text) > max_chars:
+                    parts.append(chunk_text[: max_chars - size])
+                    return "".join(parts), True
+                parts.append(chunk_text)
+                size += len(chunk_text)
+        finally:
+            # решту рядків курсора не дочитуємо
+            await result.close()
+        return "".join(parts), False
 
-        full_text = "\n\n".join(chunks)
+    async def _get_context(
+        self, db: AsyncSession, project_id: int, document_ids: list[int] | None = None
+    ) -> str:
+        """Витягує текст з бази, не більше CONTEXT_MAX_CHARS"""
+        context, _ = await self._stream_context(
+            db, project_id, document_ids, self.CONTEXT_MAX_CHARS
+        )
+        return context
 
-        if len(full_text) > 200_000:
-            return full_text[:200_000]
-        return full_text
+    async def _get_document_text(self, db: AsyncSession, document_id: int) -> str:
+        """Повний текст одного документа, без обрізання"""
+        stmt = (
+            select(DocumentChunk.chunk_text)
+            .filter(DocumentChunk.document_id == document_id)
+            .order_by(DocumentChunk.chunk_index)
+            .execution_options(yield_per=self.CONTEXT_FETCH_ROWS)
+        )
+        result = await db.stream_scalars(stmt)
+        return "\n\n".join([chunk_text async for chunk_text in result])
 
-    def _generate_ai(self, prompt: str, schema=None) -> str | BaseModel:
-        config = None
+    def _fallback(self, schema, message: str) -> str | BaseModel:
         if schema:
-            config = types.GenerateContentConfig(
-                response_mime_type="application/json", response_schema=schema
-            )
+            if schema == ExamResponse:
+                return ExamResponse(questions=[])
+            if schema == KeyPointsResponse:
+                return KeyPointsResponse(points=[])
+        return message
 
+    async def _generate_ai(self, prompt: str, schema=None) -> str | BaseModel:
         try:
-            response = client.models.generate_content(
-                model=settings.GEMINI_MODEL, contents=prompt, config=config
-            )
-
             if schema:
-                return response.parsed
-            return response.text
+                return await llm_gateway.generate_json(prompt, schema, lane="study")
+            return await llm_gateway.generate(prompt, lane="study")
 
         except Exception as e:
             print(f"AI Generation Error: {e}")
-            if schema:
-                if schema == ExamResponse:
-                    return ExamResponse(questions=[])
-                if schema == KeyPointsResponse:
-                    return KeyPointsResponse(points=[])
-            return "Виникла помилка при генерації."
+            return self._fallback(schema, self.GENERATION_ERROR_MESSAGE)
 
-    # --- CACHE LOGIC ---
+    @staticmethod
+    async def _report(progress: Progress | None, percent: int, message: str):
+        # прогрес - лише інформація для клієнта, генерацію через нього не зупиняємо
+        if progress is None:
+            return
+        try:
+            await progress(percent, message)
+        except Exception as e:
+            print(f"Progress Error: {e}")
+
+    # --- RETRIEVAL ---
+
+    async def _retrieve_for_questions(
+        self, project_id: int, questions: list[str], document_ids: list[int] | None
+    ) -> list[list[RetrievedChunk]] | None:
+        """
+        Гібридний пошук (як у чаті) окремо для кожного питання, паралельно.
+        Питання векторизуються одним запитом; кожен пошук - у своїй короткій
+        сесії, бо одна сесія не виконує запити паралельно. None - не вдалось
+        отримати вектори. Одночасних сесій не більше STUDY_QUESTION_CONCURRENCY,
+        щоб один запит не забрав увесь пул з'єднань.
+        """
+        vectors = await rag_service.get_embeddings(questions, lane="study")
+        if len(vectors) != len(questions):
+            return None
+
+        semaphore = asyncio.Semaphore(max(1, settings.STUDY_QUESTION_CONCURRENCY))
+
+        async def search(question: str, vector: list[float]) -> list[RetrievedChunk]:
+            async with semaphore, AsyncSessionLocal() as db:
+                return await retrieval_service.hybrid_search(
+                    db,
+                    project_id,
+                    question,
+                    vector,
+                    top_n=settings.STUDY_QUESTION_TOP_K,
+                    document_ids=document_ids,
+                )
 
-    def _save_data_to_db(self, db_obj, field: str, value):
-        data_to_save = value
+        return list(
+            await asyncio.gather(*(search(q, v) for q, v in zip(questions, vectors, strict=True)))
+        )
 
-        # 1. Якщо це Pydantic модель -> конвертуємо в dict
-        if isinstance(value, BaseModel):
-            data_to_save = value.model_dump()
+    @staticmethod
+    def _merge_chunks(results: list[list[RetrievedChunk]], max_chars: int) -> str:
+        """
+        Зливає результати питань без дублікатів: по черзі беремо найкращий ще не
+        взятий чанк кожного питання, тож при обрізанні бюджетом кожне питання
+        лишається з найрелевантнішим контекстом.
+        """
+        seen: set[int] = set()
+        parts: list[str] = []
+        size = 0
+        for rank in range(max((len(chunks) for chunks in results), default=0)):
+            for chunks in results:
+                if rank >= len(chunks) or chunks[rank].id in seen:
+                    continue
+                chunk = chunks[rank]
+                part = f"[{chunk.filename}]\n{chunk.chunk_text}"
+                if size + len(part) > max_chars:
+                    return "\n\n".join(parts)
+                seen.add(chunk.id)
+                parts.append(part)
+                size += len(part) + 2
+        return "\n\n".join(parts)
+
+    # --- MAP-REDUCE ---
+
+    @staticmethod
+    def _split_groups(parts: list[str], max_chars: int) -> list[str]:
+        """Склеює частини в групи до max_chars; завелика частина ріжеться"""
+        groups: list[str] = []
+        current: list[str] = []
+        size = 0
+        for part in parts:
+            while len(part) > max_chars:
+                if current:
+                    groups.append("\n\n".join(current))
+                    current, size = [], 0
+                groups.append(part[:max_chars])
+                part = part[max_chars:]
+            if current and size + len(part) > max_chars:
+                groups.append("\n\n".join(current))
+                current, size = [], 0
+            if part:
+                current.append(part)
+                size += len(part) + 2
+        if current:
+            groups.append("\n\n".join(current))
+        return groups
+
+    async def _summarize_groups(
+        self, template: str, groups: list[str], semaphore: asyncio.Semaphore
+    ) -> list[str]:
+        async def run(group: str) -> str:
+            async with semaphore:
+                return await llm_gateway.generate(template.format(context=group), lane="study")
+
+        return list(await asyncio.gather(*(run(group) for group in groups)))
+
+    async def _reduce_notes(self, notes: list[str], semaphore: asyncio.Semaphore) -> str:
+        """Ієрархічно зводить конспекти, поки разом вони не вмістяться в один виклик"""
+        while len(notes) > 1 and sum(len(note) for note in notes) > settings.STUDY_MAP_GROUP_CHARS:
+            groups = self._split_groups(notes, settings.STUDY_MAP_GROUP_CHARS)
+            if len(groups) >= len(notes):
+                # навіть дві частини не влазять в групу - зводимо попарно, щоб рівні скінчились
+                groups = ["\n\n".join(notes[i : i + 2]) for i in range(0, len(notes), 2)]
+            notes = await self._summarize_groups(StudyPrompts.REDUCE_NOTES, groups, semaphore)
+        return "\n\n".join(notes)
+
+    async def _map_document(self, text: str, semaphore: asyncio.Semaphore) -> str:
+        groups = self._split_groups(text.split("\n\n"), settings.STUDY_MAP_GROUP_CHARS)
+        notes = await self._summarize_groups(StudyPrompts.MAP_NOTES, groups, semaphore)
+        return await self._reduce_notes(notes, semaphore)
+
+    def _notes_key(self, version: list) -> str:
+        """
+        Конспект залежить від версії вмісту документа (див. _content_version),
+        промптів і моделі, тож ключ рахується без читання тексту
+        """
+        payload = {
+            "document": version,
+            "prompts": hashlib.sha256(
+                (StudyPrompts.MAP_NOTES + StudyPrompts.REDUCE_NOTES).encode()
+            ).hexdigest(),
+            "model": settings.GEMINI_MODEL,
+            "group_chars": settings.STUDY_MAP_GROUP_CHARS,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    async def _map_reduce_context(
+        self,
+        db: AsyncSession,
+        project_id: int,
+        document_ids: list[int] | None,
+        progress: Progress | None = None,
+    ) -> str:
+        """
+        Конспект кожного документа (map, паралельно до STUDY_MAP_CONCURRENCY викликів),
+        потім ієрархічне зведення (reduce). Конспекти документів кешуються окремо
+        за версією вмісту, тому текст читається лише для документів без конспекту,
+        а новий документ у проекті коштує один map, а не повну регенерацію.
+        """
+        semaphore = asyncio.Semaphore(max(1, settings.STUDY_MAP_CONCURRENCY))
+        versions = await self._content_version(db, project_id, document_ids)
+        # документ без чанків нічого не додає до контексту
+        keys = {row[0]: self._notes_key(row) for row in versions if row[2]}
+
+        # сесія не підтримує паралельних запитів, тому БД - послідовно, модель - паралельно
+        notes_by_key: dict[str, str] = {}
+        for key in keys.values():
+            cached = await self._get_cached(db, project_id, key)
+            if cached is not None:
+                notes_by_key[key] = cached
+
+        missing = [document_id for document_id, key in keys.items() if key not in notes_by_key]
+        metrics.inc("study_notes_cache_hits", len(notes_by_key))
+        metrics.inc("study_notes_cache_misses", len(missing))
+
+        db_lock = asyncio.Lock()
+        # у пам'яті одночасно не більше STUDY_MAP_CONCURRENCY повних текстів
+        documents = asyncio.Semaphore(max(1, settings.STUDY_MAP_CONCURRENCY))
+        done = 0
+
+        async def map_one(document_id: int) -> str:
+            nonlocal done
+            async with documents:
+                async with db_lock:
+                    text = await self._get_document_text(db, document_id)
+                notes = await self._map_document(text, semaphore)
+            done += 1
+            await self._report(
+                progress, 10 + 70 * done // len(missing), f"Конспекти: {done}/{len(missing)}"
+            )
+            return notes
 
-        if field == "key_points" and not isinstance(data_to_save, str):
-            data_to_save = json.dumps(data_to_save, ensure_ascii=False)
+        fresh = await asyncio.gather(*(map_one(document_id) for document_id in missing))
+        for document_id, notes in zip(missing, fresh, strict=True):
+            key = keys[document_id]
+            await self._save_cache(
+                db, project_id, key, "document_notes", [document_id], False, notes
+            )
+            notes_by_key[key] = notes
 
-        setattr(db_obj, field, data_to_save)
+        await self._report(progress, 80, "Зведення конспектів")
+        return await self._reduce_notes([notes_by_key[key] for key in keys.values()], semaphore)
 
-    async def _save_full_project_cache(self, db: AsyncSession, project_id: int, field: str, value):
-        stmt = select(ProjectAnalysisItem).filter_by(project_id=project_id)
-        result = await db.execute(stmt)
-        analysis = result.scalars().first()
-        if not analysis:
-            analysis = ProjectAnalysis(project_id=project_id)
-            db.add(analysis)
+    # --- CACHE LOGIC ---
 
-        self._save_data_to_db(analysis, field, value)
-        await db.commit()
+    async def _content_version(
+        self, db: AsyncSession, project_id: int, document_ids: list[int] | None
+    ) -> list[list]:
+        """
+        Версія вмісту документів: хеш файлу, кількість чанків і id останнього чанка.
+        Перевантаження чи повторна обробка документа змінює id чанків, додавання чи
+        видалення - склад списку, тож кожна з цих подій дає новий ключ кешу.
+        """
+        stmt = (
+            select(
+                Document.id,
+                Document.content_hash,
+                func.count(DocumentChunk.id),
+                func.max(DocumentChunk.id),
+            )
+            .outerjoin(DocumentChunk)
+            .filter(Document.project_id == project_id)
+            .group_by(Document.id)
+            .order_by(Document.id)
+        )
+        if document_ids:
+            stmt = stmt.filter(Document.id.in_(document_ids))
+        result = await db.execute(stmt)
+        return [list(row) for row in result.all()]
+
+    def _cache_key(self, versions: list[list], field_name: str, prompt: str, params: dict) -> str:
+        """Ключ з усього, від чого залежить відповідь моделі"""
+        payload = {
+            "documents": versions,
+            "field": field_name,
+            # шаблон уже містить параметри запиту (складність, кількість питань)
+            "prompt": hashlib.sha256(prompt.encode()).hexdigest(),
+            "params": params,
+            "model": settings.GEMINI_MODEL,
+            "context_max_chars": self.CONTEXT_MAX_CHARS,
+            "map_reduce": [
+                settings.STUDY_MAP_REDUCE_THRESHOLD_CHARS,
+                settings.STUDY_MAP_GROUP_CHARS,
+            ],
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    def _parse_cached(self, content, response_schema=None):
+        if response_schema is None:
+            return content
+        try:
+            return response_schema.model_validate(content)
+        except Exception as e:
+            print(f"Cache parsing error for {response_schema.__name__}: {e}")
+            return None
 
-    async def _save_partial_cache(
-        self, db: AsyncSession, project_id: int, doc_hash: str, field: str, value
+    async def _get_cached(
+        self, db: AsyncSession, project_id: int, cache_key: str, response_schema=None
     ):
-        stmt = select(ProjectAnalysisItem).filter_by(project_id=project_id, documents_hash=doc_hash)
-        result = await db.execute(stmt)
-        item = result.scalars().first()
-        if not item:
-            item = ProjectAnalysisItem(project_id=project_id, documents_hash=doc_hash)
-            db.add(item)
+        entry = await crud_study_cache.get(db, project_id, cache_key)
+        if entry is None:
+            return None
+        return self._parse_cached(entry.content, response_schema)
 
-        self._save_data_to_db(item, field, value)
-        await db.commit()
+    async def _save_cache(
+        self,
+        db: AsyncSession,
+        project_id: int,
+        cache_key: str,
+        field_name: str,
+        document_ids: list[int],
+        is_full_project: bool,
+        value,
+    ):
+        content = value.model_dump(mode="json") if isinstance(value, BaseModel) else value
+        await crud_study_cache.upsert(
+            db, project_id, cache_key, field_name, document_ids, is_full_project, content
+        )
 
     def _is_valid_result(self, result) -> bool:
         if isinstance(result, ExamResponse):
             return bool(result.questions)
         if isinstance(result, KeyPointsResponse):
             return bool(result.points)
+        if isinstance(result, UserQuestionsResponse):
+            return bool(result.results)
 
         if isinstance(result, str):
-            if not result.strip():
-                return False
-            if "Error" in result or "помилка" in result.lower():
-                return False
-            return True
+            return bool(result.strip()) and result not in self.FALLBACK_MESSAGES
         return False
 
     # --- MAIN ORCHESTRATOR ---
 
-    async def _process_request(
+    async def _generate_and_cache(
         self,
         db: AsyncSession,
         project_id: int,
+        cache_key: str,
         document_ids: list[int] | None,
+        scope_ids: list[int],
         field_name: str,
         prompt_template: str,
         response_schema=None,
+        progress: Progress | None = None,
     ):
-        cached_data = None
-        if not document_ids:
-            stmt = select(ProjectAnalysis).filter_by(project_id=project_id)
-            result = await db.execute(stmt)
-            analysis = result.scalars().first()
-            if analysis:
-                cached_data = getattr(analysis, field_name)
-        else:
-            doc_hash = self._get_docs_hash(document_ids)
-            stmt = select(ProjectAnalysisItem).filter_by(
-                project_id=project_id, documents_hash=doc_hash
-            )
-            result = await db.execute(stmt)
-            item = result.scalars().first()
-            if item:
-                cached_data = getattr(item, field_name)
-
-        if cached_data:
-            if response_schema:
-                try:
-                    # Варіант А: Кеш прийшов як рядок (для key_points, бо в БД це TEXT)
-                    if isinstance(cached_data, str):
-                        data_dict = json.loads(cached_data)
-                        return response_schema(**data_dict)
-
-                    # Варіант Б: Кеш прийшов як список/словник (для exam_questions, бо в БД це JSONB)
-                    if isinstance(cached_data, (dict, list)):
-                        # Специфіка ExamResponse: в БД ми могли зберегти просто список питань
-                        if field_name == "exam_questions" and isinstance(cached_data, list):
-                            return response_schema(questions=cached_data)
-
-                        return response_schema(**cached_data)
-
-                except Exception as e:
-                    print(f"Cache parsing error for {field_name}: {e}")
-            else:
-                return cached_data
-
-        context = await self._get_context(db, project_id, document_ids)
+        # спершу читаємо не більше порогу; весь текст потрібен лише для map-reduce
+        context, truncated = await self._stream_context(
+            db, project_id, document_ids, settings.STUDY_MAP_REDUCE_THRESHOLD_CHARS
+        )
+        await self._report(progress, 10, "Контекст завантажено")
         if not context:
-            if response_schema:
-                if response_schema == ExamResponse:
-                    return ExamResponse(questions=[])
-                if response_schema == KeyPointsResponse:
-                    return KeyPointsResponse(points=[])
-            return "Текст відсутній."
+            return self._fallback(response_schema, self.NO_TEXT_MESSAGE)
+
+        if truncated:
+            try:
+                context = await self._map_reduce_context(db, project_id, document_ids, progress)
+            except Exception as e:
+                print(f"Map-reduce Error: {e}")
+                return self._fallback(response_schema, self.GENERATION_ERROR_MESSAGE)
 
-        full_prompt = prompt_template.format(context=context)
-        result = self._generate_ai(full_prompt, schema=response_schema)
+        full_prompt = prompt_template.format(context=context[: self.CONTEXT_MAX_CHARS])
+        await self._report(progress, 85, "Генерація")
+        result = await self._generate_ai(full_prompt, schema=response_schema)
 
         if self._is_valid_result(result):
-            if not document_ids:
-                await self._save_full_project_cache(db, project_id, field_name, result)
-            else:
-                await self._save_partial_cache(
-                    db,
+            await self._save_cache(
+                db, project_id, cache_key, field_name, scope_ids, not document_ids, result
+            )
+
+        return result
+
+    async def _generate_single_flight(
+        self,
+        project_id: int,
+        cache_key: str,
+        document_ids: list[int] | None,
+        scope_ids: list[int],
+        field_name: str,
+        prompt_template: str,
+        response_schema=None,
+        progress: Progress | None = None,
+    ):
+        """
+        Одна генерація на ключ кешу в усьому кластері. Хто не взяв advisory lock,
+        чекає, поки переможець запише кеш, і віддає результат з кешу. Якщо
+        переможець не записав нічого за STUDY_SINGLE_FLIGHT_WAIT, генеруємо самі.
+        """
+        args = (
+            project_id,
+            cache_key,
+            document_ids,
+            scope_ids,
+            field_name,
+            prompt_template,
+            response_schema,
+            progress,
+        )
+        deadline = time.monotonic() + settings.STUDY_SINGLE_FLIGHT_WAIT
+
+        # власна сесія: запит, що запустив генерацію, може завершитись раніше за неї
+        async with AsyncSessionLocal() as db:
+            while True:
+                async with try_advisory_lock(f"study:{project_id}:{cache_key}") as acquired:
+                    if acquired:
+                        cached = await self._get_cached(db, project_id, cache_key, response_schema)
+                        if cached is not None:
+                            return cached
+                        return await self._generate_and_cache(db, *args)
+
+                cached = await self._get_cached(db, project_id, cache_key, response_schema)
+                if cached is not None:
+                    metrics.inc("study_coalesced", scope="cluster", field=field_name)
+                    return cached
+                if time.monotonic() > deadline:
+                    return await self._generate_and_cache(db, *args)
+                await db.rollback()
+                await asyncio.sleep(settings.STUDY_SINGLE_FLIGHT_POLL_INTERVAL)
+
+    async def _process_request(
+        self,
+        db: AsyncSession,
+        project_id: int,
+        document_ids: list[int] | None,
+        field_name: str,
+        prompt_template: str,
+        response_schema=None,
+        params: dict | None = None,
+        progress: Progress | None = None,
+    ):
+        versions = await self._content_version(db, project_id, document_ids)
+        scope_ids = [row[0] for row in versions]
+        cache_key = self._cache_key(versions, field_name, prompt_template, params or {})
+
+        cached = await self._get_cached(db, project_id, cache_key, response_schema)
+        if cached is not None:
+            metrics.inc("study_cache_hits", field=field_name)
+            return cached
+        metrics.inc("study_cache_misses", field=field_name)
+
+        # однакові одночасні запити в процесі чекають на одну задачу генерації
+        key = f"{project_id}:{cache_key}"
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(
+                self._generate_single_flight(
                     project_id,
-                    self._get_docs_hash(document_ids),
+                    cache_key,
+                    document_ids,
+                    scope_ids,
                     field_name,
-                    result,
+                    prompt_template,
+                    response_schema,
+                    progress,
                 )
+            )
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            metrics.inc("study_coalesced", scope="process", field=field_name)
 
-        return result
+        # shield: відключення одного клієнта не скасовує генерацію для решти
+        return await asyncio.shield(task)
 
     # --- PUBLIC API METHODS ---
 
     async def get_summary(
-        self, db: AsyncSession, project_id: int, document_ids: list[int] | None
+        self,
+        db: AsyncSession,
+        project_id: int,
+        document_ids: list[int] | None,
+        progress: Progress | None = None,
     ) -> str:
         return await self._process_request(
             db,
@@ -208,10 +538,15 @@ class StudyService:
             document_ids,
             field_name="summary",
             prompt_template=StudyPrompts.SUMMARY,
+            progress=progress,
         )
 
     async def get_keypoints(
-        self, db: AsyncSession, project_id: int, document_ids: list[int] | None
+        self,
+        db: AsyncSession,
+        project_id: int,
+        document_ids: list[int] | None,
+        progress: Progress | None = None,
     ) -> KeyPointsResponse:
         return await self._process_request(
             db,
@@ -220,6 +555,7 @@ class StudyService:
             field_name="key_points",
             prompt_template=StudyPrompts.KEY_POINTS,
             response_schema=KeyPointsResponse,
+            progress=progress,
         )
 
     async def get_exam_questions(
@@ -229,6 +565,7 @@ class StudyService:
         document_ids: list[int] | None,
         difficulty="Medium",
         question_count=10,
+        progress: Progress | None = None,
     ) -> ExamResponse:
         prompt = StudyPrompts.EXAM_GENERATION.format(
             difficulty=difficulty, question_count=question_count, context="{context}"
@@ -240,6 +577,8 @@ class StudyService:
             field_name="exam_questions",
             prompt_template=prompt,
             response_schema=ExamResponse,
+            params={"difficulty": difficulty, "question_count": question_count},
+            progress=progress,
         )
 
     async def answer_user_questions(
@@ -248,15 +587,62 @@ class StudyService:
         project_id: int,
         questions: list[str],
         document_ids: list[int] | None,
+        progress: Progress | None = None,
     ) -> str:
-        context = await self._get_context(db, project_id, document_ids)
+        results = await self._retrieve_for_questions(project_id, questions, document_ids)
+        if results is None:
+            # без векторів пошук неможливий - як раніше, початок усього тексту
+            context = await self._get_context(db, project_id, document_ids)
+        else:
+            context = self._merge_chunks(results, settings.STUDY_QUESTION_CONTEXT_MAX_CHARS)
+        await self._report(progress, 10, "Контекст завантажено")
         if not context:
-            return "Немає контексту."
+            return self.NO_CONTEXT_MESSAGE
 
         q_list_str = "\n".join([f"- {q}" for q in questions])
         full_prompt = StudyPrompts.USER_QUESTION.format(questions_list=q_list_str, context=context)
 
-        return self._generate_ai(full_prompt, schema=UserQuestionsResponse)
+        await self._report(progress, 85, "Генерація")
+        return await self._generate_ai(full_prompt, schema=UserQuestionsResponse)
+
+    async def run_job(self, payload: dict, progress: Progress | None = None) -> dict:
+        """
+        Виконує study-задачу з черги (kind="study") і повертає JSON-результат
+        для jobs.result. Готові summary / key points / exam потрапляють у study_cache
+        так само, як і при синхронному запиті.
+        """
+        project_id = payload["project_id"]
+        document_ids = payload.get("document_ids")
+        tool = payload["tool"]
+
+        async with AsyncSessionLocal() as db:
+            if tool == "summary":
+                result = await self.get_summary(db, project_id, document_ids, progress)
+            elif tool == "keypoints":
+                result = await self.get_keypoints(db, project_id, document_ids, progress)
+            elif tool == "exam":
+                result = await self.get_exam_questions(
+                    db,
+                    project_id,
+                    document_ids,
+                    difficulty=payload.get("difficulty", "Medium"),
+                    question_count=payload.get("question_count", 10),
+                    progress=progress,
+                )
+            elif tool == "answer_questions":
+                result = await self.answer_user_questions(
+                    db, project_id, payload["questions"], document_ids, progress
+                )
+            else:
+                raise ValueError(f"Unknown study tool: {tool}")
+
+        # заглушка замість результату - помилка задачі: воркер повторить її,
+        # а після STUDY_JOB_MAX_ATTEMPTS позначить failed
+        if not self._is_valid_result(result):
+            raise RuntimeError(f"Study generation failed: {tool}")
+        if isinstance(result, BaseModel):
+            return result.model_dump(mode="json")
+        return {"content": result}
 
 
 study_service = StudyService()
@@ -0,0 +1,31 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from sqlalchemy import select
+from sqlalchemy.sql import func
+
+from app.core.db import engine
+
+
+@asynccontextmanager
+async def try_advisory_lock(key: str) -> AsyncIterator[bool]:
+    """
+    Неблокуючий session-level advisory lock Postgres за довільним рядком-ключем,
+    віддає True, якщо лок взято. Лок живе на окремому з'єднанні, тож його можна
+    тримати під час довгого виклику моделі без відкритої транзакції в робочій сесії.
+    Якщо процес впаде, Postgres зніме лок разом із з'єднанням.
+    """
+    lock_id = func.hashtextextended(key, 0)
+    async with engine.connect() as conn:
+        acquired = bool(await conn.scalar(select(func.pg_try_advisory_lock(lock_id))))
+        await conn.commit()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                try:
+                    await conn.execute(select(func.pg_advisory_unlock(lock_id)))
+                except BaseException:
+                    # з'єднання з невідпущеним локом не можна повертати в пул
+                    await conn.invalidate()
+                    raise
@@ -1,20 +1,88 @@
-import shutil
+import asyncio
+import hashlib
+import re
 import uuid
 from pathlib import Path
 
 from fastapi import UploadFile
+from pypdf import PdfReader
+
+from app.core.config import settings
 
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
+CHUNK_SIZE = 1024 * 1024
+
+# об'єкти сторінок, не плутати з /Type /Pages (вузли дерева сторінок)
+PAGE_OBJECT_RE = re.compile(rb"/Type\s*/Page(?![A-Za-z])")
+
+
+class UploadLimitError(ValueError):
+    """Файл перевищує MAX_UPLOAD_SIZE_MB або MAX_UPLOAD_PAGES"""
+
+
+def _write_chunk(buffer, sha256, chunk: bytes):
+    sha256.update(chunk)
+    buffer.write(chunk)
+
 
-def save_upload_file(upload_file: UploadFile) -> str:
+def _count_pages(file_path: Path) -> int:
+    return len(PdfReader(str(file_path)).pages)
+
+
+async def save_upload_file(upload_file: UploadFile) -> tuple[str, str]:
+    """
+    Зберігає файл шматками по CHUNK_SIZE, не блокуючи event loop, і за той самий
+    прохід рахує SHA-256; повертає (шлях, хеш).
+
+    Ліміти перевіряються по ходу запису: розмір - точно, кількість сторінок -
+    за нижньою оцінкою (видимі об'єкти /Type /Page), тож явно завеликий файл
+    відкидається до того, як ляже на диск повністю. Після запису кількість
+    сторінок перевіряється точно.
+    """
+    max_bytes = settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024
     unique_filename = f"{uuid.uuid4()}_{upload_file.filename}"
     file_path = UPLOAD_DIR / unique_filename
+    sha256 = hashlib.sha256()
+    written = 0
+    pages_seen = 0
+    tail = b""
+
+    buffer = await asyncio.to_thread(file_path.open, "wb")
+    try:
+        try:
+            while chunk := await upload_file.read(CHUNK_SIZE):
+                written += len(chunk)
+                if written > max_bytes:
+                    raise UploadLimitError(f"File is larger than {settings.MAX_UPLOAD_SIZE_MB} MB")
+
+                # хвіст попереднього шматка, щоб не пропустити маркер на межі
+                window = tail + chunk
+                pages_seen += len(PAGE_OBJECT_RE.findall(window)) - len(
+                    PAGE_OBJECT_RE.findall(tail)
+                )
+                tail = window[-32:]
+                if pages_seen > settings.MAX_UPLOAD_PAGES:
+                    raise UploadLimitError(f"PDF has more than {settings.MAX_UPLOAD_PAGES} pages")
+
+                await asyncio.to_thread(_write_chunk, buffer, sha256, chunk)
+        finally:
+            await asyncio.to_thread(buffer.close)
+
+        if file_path.suffix.lower() == ".pdf":
+            try:
+                page_count = await asyncio.to_thread(_count_pages, file_path)
+            except Exception:
+                # битий PDF не є порушенням ліміту, з ним розбереться обробка
+                page_count = 0
+            if page_count > settings.MAX_UPLOAD_PAGES:
+                raise UploadLimitError(f"PDF has more than {settings.MAX_UPLOAD_PAGES} pages")
+    except BaseException:
+        delete_file(str(file_path))
+        raise
 
-    with file_path.open("wb") as buffer:
-        shutil.copyfileobj(upload_file.file, buffer)
-    return str(file_path)
+    return str(file_path), sha256.hexdigest()
 
 
 def delete_file(file_path: str):
@@ -0,0 +1,42 @@
+import asyncio
+from collections.abc import AsyncGenerator
+
+from starlette.requests import Request
+
+
+async def _wait_for_disconnect(request: Request):
+    # тіло запиту вже прочитане, тож наступне повідомлення ASGI - http.disconnect
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def cancel_on_disconnect(
+    request: Request, events: AsyncGenerator[str, None]
+) -> AsyncGenerator[str, None]:
+    """
+    Обгортка для StreamingResponse: щойно клієнт відключився, поточний крок
+    генератора (пошук, виклик моделі) скасовується, а сам генератор закривається,
+    не чекаючи наступної невдалої спроби запису в сокет.
+    """
+    disconnected = asyncio.create_task(_wait_for_disconnect(request))
+    step: asyncio.Future | None = None
+    try:
+        while True:
+            step = asyncio.ensure_future(anext(events))
+            await asyncio.wait({step, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if not step.done():
+                return
+            try:
+                event = step.result()
+            except StopAsyncIteration:
+                return
+            yield event
+    finally:
+        disconnected.cancel()
+        if step is not None and not step.done():
+            # генератор не можна закрити, поки його крок виконується в іншій задачі
+            step.cancel()
+            await asyncio.gather(step, return_exceptions=True)
+        await events.aclose()
@@ -0,0 +1,275 @@
+"""
+Окремий процес-воркер для фонових задач (обробка документів тощо).
+
+    python -m app.worker --processes 4 --concurrency 2
+
+Воркери забирають задачі з таблиці jobs через SELECT ... FOR UPDATE SKIP LOCKED,
+тому їх можна запускати скільки завгодно, на будь-яких хостах з доступом до БД.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import uuid
+from collections.abc import Awaitable, Callable
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.core.metrics import metrics
+from app.crud import document as crud_document
+from app.crud import job as crud_job
+from app.models.job import Job
+from app.services.embedding_cache import embedding_cache, query_embedding_cache
+from app.services.rag_service import rag_service
+from app.services.study_service import study_service
+
+logger = logging.getLogger("app.worker")
+
+# довільна константа для advisory lock, щоб recovery одночасно робив лише один воркер
+RECOVERY_LOCK_ID = 7_301_004
+
+
+async def handle_process_document(job: Job):
+    final_attempt = job.attempts >= job.max_attempts
+    await rag_service.process_document(job.payload["document_id"], final_attempt=final_attempt)
+
+
+async def handle_study(job: Job) -> dict:
+    async def progress(percent: int, message: str):
+        async with AsyncSessionLocal() as db:
+            await crud_job.set_progress(db, job.id, percent, message)
+
+    return await study_service.run_job(job.payload, progress)
+
+
+async def exhaust_process_document(job: Job):
+    # інакше документ лишиться в processing, і recovery поставить нову задачу з нуля
+    async with AsyncSessionLocal() as db:
+        await crud_document.mark_failed(db, job.payload["document_id"])
+
+
+HANDLERS: dict[str, Callable[[Job], Awaitable[dict | None]]] = {
+    "process_document": handle_process_document,
+    "study": handle_study,
+}
+
+# викликаються, коли задача вичерпала спроби, так і не дійшовши до обробника
+EXHAUSTED_HANDLERS: dict[str, Callable[[Job], Awaitable[None]]] = {
+    "process_document": exhaust_process_document,
+}
+
+
+def _backoff(attempt: int) -> float:
+    """Експоненційна затримка з jitter"""
+    delay = min(settings.JOB_RETRY_MAX_DELAY, settings.JOB_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+async def _keep_lease(job_id: int, worker_id: str):
+    interval = max(1, settings.JOB_VISIBILITY_TIMEOUT // 3)
+    while True:
+        await asyncio.sleep(interval)
+        async with AsyncSessionLocal() as db:
+            if not await crud_job.heartbeat(db, job_id, worker_id, settings.JOB_VISIBILITY_TIMEOUT):
+                logger.warning("Lost lease on job %s", job_id)
+                return
+
+
+async def run_job(job: Job, worker_id: str):
+    handler = HANDLERS[job.kind]
+    lease = asyncio.create_task(_keep_lease(job.id, worker_id))
+    try:
+        if job.attempts > job.max_attempts:
+            # lease спливав забагато разів - воркер, найімовірніше, падає на цій задачі
+            on_exhausted = EXHAUSTED_HANDLERS.get(job.kind)
+            if on_exhausted is not None:
+                await on_exhausted(job)
+            raise RuntimeError("Attempts exhausted after expired leases")
+        result = await handler(job)
+    except Exception as e:
+        async with AsyncSessionLocal() as db:
+            status = await crud_job.retry_or_fail(
+                db, job, worker_id, repr(e), _backoff(job.attempts)
+            )
+        logger.warning(
+            "Job %s (%s) attempt %s: %s -> %s", job.id, job.kind, job.attempts, e, status
+        )
+    else:
+        async with AsyncSessionLocal() as db:
+            await crud_job.complete(db, job.id, worker_id, result=result)
+        logger.info("Job %s (%s) done", job.id, job.kind)
+    finally:
+        lease.cancel()
+
+
+async def recover_stuck_documents():
+    """Ставить у чергу документи, що лишились у pending/processing без задачі"""
+    async with AsyncSessionLocal() as db:
+        locked = await db.scalar(
+            text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": RECOVERY_LOCK_ID}
+        )
+        if not locked:
+            return
+
+        document_ids = await crud_document.get_unqueued_document_ids(db)
+        for document_id in document_ids:
+            db.add(
+                Job(
+                    kind="process_document",
+                    payload={"document_id": document_id},
+                    status="queued",
+                    attempts=0,
+                    max_attempts=settings.JOB_MAX_ATTEMPTS,
+                )
+            )
+        await db.commit()
+
+    if document_ids:
+        logger.info("Re-queued %s stuck documents: %s", len(document_ids), document_ids)
+
+
+async def _worker_loop(worker_id: str, stop: asyncio.Event):
+    while not stop.is_set():
+        try:
+            async with AsyncSessionLocal() as db:
+                job = await crud_job.claim(
+                    db, list(HANDLERS), worker_id, settings.JOB_VISIBILITY_TIMEOUT
+                )
+        except Exception as e:
+            logger.error("Failed to claim job: %s", e)
+            job = None
+
+        if job is None:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=settings.JOB_POLL_INTERVAL)
+            except TimeoutError:
+                pass
+            continue
+
+        await run_job(job, worker_id)
+
+
+async def _maintenance_loop(stop: asyncio.Event):
+    while not stop.is_set():
+        try:
+            await recover_stuck_documents()
+        except Exception as e:
+            logger.error("Recovery failed: %s", e)
+        try:
+            evicted = await embedding_cache.evict()
+            if evicted:
+                logger.info("Evicted %s embedding cache rows", evicted)
+        except Exception as e:
+            logger.error("Embedding cache eviction failed: %s", e)
+        try:
+            evicted = await query_embedding_cache.evict()
+            if evicted:
+                logger.info("Evicted %s query embedding cache rows", evicted)
+        except Exception as e:
+            logger.error("Query embedding cache eviction failed: %s", e)
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=settings.JOB_RECOVERY_INTERVAL)
+        except TimeoutError:
+            pass
+
+
+async def _metrics_loop(stop: asyncio.Event):
+    """Лічильники процесу воркера - одним JSON-рядком у лог, наростаючим підсумком"""
+    interval = settings.WORKER_METRICS_LOG_INTERVAL
+    if interval <= 0:
+        return
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except TimeoutError:
+            pass
+        snapshot = metrics.snapshot()
+        if snapshot["counters"] or snapshot["timings"]:
+            logger.info("Metrics %s", json.dumps(snapshot, sort_keys=True))
+
+
+async def run_worker(concurrency: int = 1):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    base_id = f"{socket.gethostname()}:{os.getpid()}"
+    workers = [
+        _worker_loop(f"{base_id}:{i}:{uuid.uuid4().hex[:6]}", stop) for i in range(concurrency)
+    ]
+    logger.info("Worker %s started with concurrency %s", base_id, concurrency)
+    await asyncio.gather(_maintenance_loop(stop), _metrics_loop(stop), *workers)
+
+
+def _cap_llm_lanes(processes: int):
+    """
+    Стелі WORKER_LLM_* діляться між процесами воркера й замінюють ліміти
+    планувальника в цьому процесі. Планувальник читає налаштування ліниво,
+    тож це треба зробити до першого виклику моделі.
+    """
+
+    def share(limit: int) -> int:
+        return max(1, limit // processes)
+
+    settings.LLM_MAX_CONCURRENCY = min(
+        settings.LLM_MAX_CONCURRENCY, share(settings.WORKER_LLM_MAX_CONCURRENCY)
+    )
+    settings.LLM_LANE_CONCURRENCY = {
+        **settings.LLM_LANE_CONCURRENCY,
+        **{lane: share(limit) for lane, limit in settings.WORKER_LLM_LANE_CONCURRENCY.items()},
+    }
+    settings.LLM_LANE_TOKENS_PER_MINUTE = {
+        **settings.LLM_LANE_TOKENS_PER_MINUTE,
+        **{
+            lane: share(limit) if limit > 0 else 0
+            for lane, limit in settings.WORKER_LLM_LANE_TOKENS_PER_MINUTE.items()
+        },
+    }
+
+
+def _run_process(concurrency: int, processes: int = 1):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    _cap_llm_lanes(processes)
+    asyncio.run(run_worker(concurrency))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Background job worker")
+    parser.add_argument("--processes", type=int, default=1, help="кількість OS-процесів")
+    parser.add_argument("--concurrency", type=int, default=1, help="задач одночасно на процес")
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        _run_process(args.concurrency)
+        return
+
+    ctx = multiprocessing.get_context("spawn")
+    processes = [
+        ctx.Process(target=_run_process, args=(args.concurrency, args.processes))
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+
+    def forward(signum, _frame):
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signum)
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
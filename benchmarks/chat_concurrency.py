@@ -0,0 +1,122 @@
+"""
+Перевірка, що одночасні чати не серіалізуються на виклику Gemini.
+
+Клієнт Gemini, пошук і запис історії підмінені фейками з фіксованою затримкою
+(asyncio.sleep), тож БД і ключ API не потрібні. Якщо хоч один виклик моделі
+блокує event loop, загальний час росте лінійно з кількістю чатів і скрипт
+падає з AssertionError.
+
+    python -m benchmarks.chat_concurrency --chats 50 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+from app.core.config import settings
+from app.services import chat_service as chat_module
+from app.services import llm_gateway as gateway_module
+from app.services.chat_service import chat_service
+from app.services.rag_service import rag_service
+from app.services.retrieval_service import RetrievedChunk, retrieval_service
+
+
+class Tracker:
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+
+    async def call(self, latency: float):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(latency)
+        finally:
+            self.active -= 1
+
+
+def make_fake_client(tracker: Tracker, latency: float, tokens: int):
+    async def generate_content(**_):
+        await tracker.call(latency)
+        return SimpleNamespace(text="rewritten question")
+
+    async def stream_tokens():
+        for i in range(tokens):
+            await tracker.call(latency / tokens)
+            yield SimpleNamespace(text=f"token{i} ")
+
+    async def generate_content_stream(**_):
+        return stream_tokens()
+
+    models = SimpleNamespace(
+        generate_content=generate_content, generate_content_stream=generate_content_stream
+    )
+    return SimpleNamespace(aio=SimpleNamespace(models=models))
+
+
+class FakeSession:
+    """Повертає один запис історії, щоб спрацьовував переформулювання питання"""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_exc):
+        return None
+
+    async def execute(self, _stmt):
+        item = SimpleNamespace(question="previous question", answer="previous answer")
+        return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: [item]))
+
+
+async def run_chat(index: int) -> int:
+    events = 0
+    async for _ in chat_service.stream_chat(1, 1, f"question {index}"):
+        events += 1
+    return events
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.5, help="секунд на виклик моделі")
+    parser.add_argument("--tokens", type=int, default=10)
+    args = parser.parse_args()
+
+    tracker = Tracker()
+    # перевіряємо event loop, а не ліміт шлюзу на модель
+    settings.LLM_MAX_CONCURRENCY = args.chats
+    settings.LLM_LANE_CONCURRENCY = {**settings.LLM_LANE_CONCURRENCY, "chat": args.chats}
+    gateway_module.client = make_fake_client(tracker, args.latency, args.tokens)
+
+    async def fake_embedding(_text):
+        await tracker.call(args.latency / 5)
+        return [0.0] * settings.EMBEDDING_DIM
+
+    async def fake_search(*_args, **_kwargs):
+        return [RetrievedChunk(1, "context", "doc.pdf")]
+
+    async def fake_history(**_kwargs):
+        return None
+
+    rag_service.get_embedding = fake_embedding
+    retrieval_service.hybrid_search = fake_search
+    chat_module.create_chat_history = fake_history
+    chat_module.AsyncSessionLocal = FakeSession
+
+    started = time.perf_counter()
+    events = await asyncio.gather(*(run_chat(i) for i in range(args.chats)))
+    elapsed = time.perf_counter() - started
+
+    # переформулювання + вектор + стрім відповіді
+    per_chat = args.latency + args.latency / 5 + args.latency
+    print(f"chats={args.chats} elapsed={elapsed:.2f}s one_chat={per_chat:.2f}s")
+    print(f"serial would take {per_chat * args.chats:.2f}s, peak overlap={tracker.peak}")
+
+    assert all(count == args.tokens + 1 for count in events), events
+    assert tracker.peak >= args.chats, "model calls did not overlap"
+    assert elapsed < per_chat * 2, "chats were serialized"
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
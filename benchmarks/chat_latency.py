@@ -0,0 +1,132 @@
+"""
+Час до першого токена в чаті: послідовний конвеєр (завжди переформулювання,
+потім вектор і пошук) проти евристики пропуску переформулювання і
+спекулятивного пошуку паралельно з ним.
+
+Gemini, пошук і БД підмінено фейками з фіксованими затримками. Сценарії:
+
+* first - перше питання в проекті, історії немає;
+* standalone - є історія, але питання самодостатнє;
+* unchanged - коротке питання, яке модель повертає без змін;
+* follow_up - уточнення, яке модель справді переформульовує.
+
+    python -m benchmarks.chat_latency --runs 20
+"""
+
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services import chat_service as chat_module
+from app.services import llm_gateway as gateway_module
+from app.services.chat_service import chat_service
+from app.services.rag_service import rag_service
+from app.services.retrieval_service import RetrievedChunk, retrieval_service
+
+SCENARIOS = {
+    "first": (False, "Що таке замикання у JavaScript та навіщо потрібні замикання"),
+    "standalone": (True, "Що таке замикання у JavaScript та навіщо потрібні замикання"),
+    "unchanged": (True, "Що таке замикання"),
+    "follow_up": (True, "А детальніше?"),
+}
+
+
+def make_fake_client(args):
+    async def generate_content(contents, **_):
+        await asyncio.sleep(args.rewrite_latency)
+        question = contents.rsplit("Last Question:", 1)[1].strip()
+        if "детальніше" in question:
+            question = "Що таке замикання у JavaScript, детальніше"
+        return SimpleNamespace(text=question, usage_metadata=None)
+
+    async def stream_tokens():
+        await asyncio.sleep(args.first_token_latency)
+        for i in range(5):
+            yield SimpleNamespace(text=f"token{i} ", usage_metadata=None)
+
+    async def generate_content_stream(**_):
+        return stream_tokens()
+
+    models = SimpleNamespace(
+        generate_content=generate_content, generate_content_stream=generate_content_stream
+    )
+    return SimpleNamespace(aio=SimpleNamespace(models=models))
+
+
+def make_session_factory(args, with_history: bool):
+    item = SimpleNamespace(question="Що таке замикання", answer="Функція разом з оточенням")
+
+    class FakeSession:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *_exc):
+            return None
+
+        async def execute(self, _stmt):
+            await asyncio.sleep(args.db_latency)
+            items = [item] if with_history else []
+            return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: items))
+
+    return FakeSession
+
+
+def first_token_ms() -> float:
+    key = 'chat_stage_seconds{stage="time_to_first_token"}'
+    return metrics.snapshot()["timings"][key]["avg"] * 1000
+
+
+async def run(args, question: str, runs: int) -> float:
+    metrics.reset()
+    for _ in range(runs):
+        async for _event in chat_service.stream_chat(1, 1, question):
+            pass
+    return first_token_ms()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--db-latency", type=float, default=0.005)
+    parser.add_argument("--rewrite-latency", type=float, default=0.4)
+    parser.add_argument("--embed-latency", type=float, default=0.1)
+    parser.add_argument("--retrieval-latency", type=float, default=0.03)
+    parser.add_argument("--first-token-latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    gateway_module.client = make_fake_client(args)
+    settings.QUERY_EMBEDDING_CACHE_SIZE = 0  # інакше повтори не платять за вектор
+
+    async def fake_embedding(_text):
+        await asyncio.sleep(args.embed_latency)
+        return [0.0] * settings.EMBEDDING_DIM
+
+    async def fake_search(*_args, **_kwargs):
+        await asyncio.sleep(args.retrieval_latency)
+        return [RetrievedChunk(1, "context", "doc.pdf")]
+
+    async def fake_history(**_kwargs):
+        return None
+
+    rag_service.get_embedding = fake_embedding
+    retrieval_service.hybrid_search = fake_search
+    chat_module.create_chat_history = fake_history
+
+    print(f"{'scenario':>11} {'sequential':>12} {'optimized':>12}  (time to first token, avg)")
+    started = time.perf_counter()
+    for name, (with_history, question) in SCENARIOS.items():
+        chat_module.AsyncSessionLocal = make_session_factory(args, with_history)
+        results = []
+        for optimized in (False, True):
+            settings.CHAT_SKIP_REWRITE_HEURISTIC = optimized
+            settings.CHAT_SPECULATIVE_RETRIEVAL = optimized
+            results.append(await run(args, question, args.runs))
+        print(f"{name:>11} {results[0]:10.1f}ms {results[1]:10.1f}ms")
+    print(f"total {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
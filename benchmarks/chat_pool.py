@@ -0,0 +1,114 @@
+"""
+Скільки чатів можуть стрімити одночасно при обмеженому пулі з'єднань БД.
+
+Пул SQLAlchemy (pool_size + max_overflow, з pool_timeout) змодельовано
+семафором, Gemini - фейковим клієнтом із benchmarks.chat_concurrency.
+Порівнюються два режими:
+
+* request - як раніше: сесія запиту тримає з'єднання весь час стріму;
+* short - короткі сесії на історію, пошук і запис відповіді.
+
+    python -m benchmarks.chat_pool --chats 60 --pool-size 15 --latency 2
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.core.config import settings
+from app.services import chat_service as chat_module
+from app.services import llm_gateway as gateway_module
+from app.services.chat_service import chat_service
+from app.services.rag_service import rag_service
+from app.services.retrieval_service import RetrievedChunk, retrieval_service
+from benchmarks.chat_concurrency import FakeSession, Tracker, make_fake_client
+
+
+class Pool:
+    def __init__(self, size: int, timeout: float):
+        self.slots = asyncio.Semaphore(size)
+        self.timeout = timeout
+        self.timeouts = 0
+
+    async def acquire(self):
+        try:
+            await asyncio.wait_for(self.slots.acquire(), self.timeout)
+        except TimeoutError:
+            self.timeouts += 1
+            raise
+
+
+def make_session_factory(pool: Pool):
+    class PooledSession(FakeSession):
+        async def __aenter__(self):
+            await pool.acquire()
+            return self
+
+        async def __aexit__(self, *_exc):
+            pool.slots.release()
+
+    return PooledSession
+
+
+async def run_case(mode: str, chats: int, pool: Pool) -> tuple[int, float]:
+    chat_module.AsyncSessionLocal = FakeSession if mode == "request" else make_session_factory(pool)
+
+    async def run_chat(index: int) -> bool:
+        try:
+            if mode == "request":
+                # з'єднання сесії запиту зайняте від перевірки проекту до кінця стріму
+                async with make_session_factory(pool)():
+                    async for _ in chat_service.stream_chat(1, 1, f"question {index}"):
+                        pass
+            else:
+                async for _ in chat_service.stream_chat(1, 1, f"question {index}"):
+                    pass
+            return True
+        except TimeoutError:
+            return False
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(run_chat(i) for i in range(chats)))
+    return sum(results), time.perf_counter() - started
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=60)
+    parser.add_argument("--pool-size", type=int, default=15, help="pool_size + max_overflow")
+    parser.add_argument("--pool-timeout", type=float, default=5.0)
+    parser.add_argument("--latency", type=float, default=2.0, help="секунд на стрім відповіді")
+    parser.add_argument("--tokens", type=int, default=20)
+    args = parser.parse_args()
+
+    settings.LLM_MAX_CONCURRENCY = args.chats
+    settings.LLM_LANE_CONCURRENCY = {**settings.LLM_LANE_CONCURRENCY, "chat": args.chats}
+
+    async def fake_embedding(_text):
+        await asyncio.sleep(0.05)
+        return [0.0] * settings.EMBEDDING_DIM
+
+    async def fake_search(*_args, **_kwargs):
+        await asyncio.sleep(0.02)
+        return [RetrievedChunk(1, "context", "doc.pdf")]
+
+    async def fake_history(**_kwargs):
+        await asyncio.sleep(0.01)
+
+    rag_service.get_embedding = fake_embedding
+    retrieval_service.hybrid_search = fake_search
+    chat_module.create_chat_history = fake_history
+
+    for mode in ("request", "short"):
+        tracker = Tracker()
+        gateway_module.client = make_fake_client(tracker, args.latency, args.tokens)
+        pool = Pool(args.pool_size, args.pool_timeout)
+        completed, elapsed = await run_case(mode, args.chats, pool)
+        print(
+            f"{mode:>7}: completed={completed}/{args.chats} pool_timeouts={pool.timeouts} "
+            f"peak_model_calls={tracker.peak} elapsed={elapsed:.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+"""
+Швидкість запису чанків (rows/s): бінарний COPY проти ORM add_all.
+
+Потрібна робоча БД з міграціями (DATABASE_URL з .env). Бенчмарк створює
+тимчасового користувача/проект/документ і видаляє їх після себе.
+
+    python -m benchmarks.chunk_write --rows 20000 --batch-size 500
+"""
+
+import argparse
+import asyncio
+import random
+import time
+import uuid
+
+from sqlalchemy import delete
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal, engine
+from app.crud import chunk as crud_chunk
+from app.models.document import Document, DocumentChunk
+from app.models.project import Project
+from app.models.user import User
+
+
+async def create_document() -> tuple[int, int]:
+    async with AsyncSessionLocal() as db:
+        user = User(email=f"bench-{uuid.uuid4().hex}@example.com", full_name="bench")
+        db.add(user)
+        await db.flush()
+        project = Project(name="bench", owner_id=user.id)
+        db.add(project)
+        await db.flush()
+        document = Document(filename="bench.pdf", file_path="-", project_id=project.id)
+        db.add(document)
+        await db.commit()
+        return user.id, document.id
+
+
+def make_rows(document_id: int, count: int) -> list[crud_chunk.ChunkRow]:
+    text = "Reciprocal rank fusion combines ranked lists. " * 20
+    return [
+        (
+            document_id,
+            i,
+            i // 5 + 1,
+            text,
+            [random.random() for _ in range(settings.EMBEDDING_DIM)],
+        )
+        for i in range(count)
+    ]
+
+
+async def run_mode(mode: str, document_id: int, rows, batch_size: int) -> float:
+    settings.CHUNK_WRITE_MODE = mode
+    settings.CHUNK_WRITE_BATCH_SIZE = batch_size
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(DocumentChunk).where(DocumentChunk.document_id == document_id))
+        await db.commit()
+
+        started = time.perf_counter()
+        # так само, як у конвеєрі: скидаємо по batch_size рядків з комітом
+        for i in range(0, len(rows), batch_size):
+            await crud_chunk.write_chunks(db, rows[i : i + batch_size])
+        return len(rows) / (time.perf_counter() - started)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    engine.echo = False
+    user_id, document_id = await create_document()
+    rows = make_rows(document_id, args.rows)
+    try:
+        for mode in ("orm", "copy"):
+            rate = await run_mode(mode, document_id, rows, args.batch_size)
+            print(f"{mode:>5}: {rate:10.0f} rows/s")
+    finally:
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(User).where(User.id == user_id))
+            await db.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
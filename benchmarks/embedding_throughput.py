@@ -0,0 +1,63 @@
+"""
+Пропускна здатність векторизації чанків (chunks/s) залежно від
+EMBED_BATCH_SIZE та EMBED_CONCURRENCY.
+
+Замість Gemini використовується фейковий бекенд із фіксованою затримкою
+на запит і невеликою затримкою на кожен елемент батчу.
+
+    python -m benchmarks.embedding_throughput --chunks 512 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.core.config import settings
+from app.services.rag_service import rag_service
+
+
+def make_fake_backend(latency: float, per_item: float):
+    async def fake_get_embeddings(texts: list[str]) -> list[list[float]]:
+        await asyncio.sleep(latency + per_item * len(texts))
+        return [[float(len(text))] * settings.EMBEDDING_DIM for text in texts]
+
+    return fake_get_embeddings
+
+
+async def run_case(chunks: list[str], batch_size: int, concurrency: int) -> float:
+    settings.EMBED_BATCH_SIZE = batch_size
+    settings.EMBED_CONCURRENCY = concurrency
+
+    started = time.perf_counter()
+    vectors = await rag_service.embed_chunks(chunks)
+    elapsed = time.perf_counter() - started
+
+    # порядок має збігатися з порядком чанків
+    assert [v[0] for v in vectors] == [float(len(c)) for c in chunks]
+    return len(chunks) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=512)
+    parser.add_argument("--latency", type=float, default=0.2, help="секунд на запит")
+    parser.add_argument("--per-item", type=float, default=0.002, help="секунд на елемент")
+    args = parser.parse_args()
+
+    settings.EMBEDDING_CACHE_ENABLED = False
+    rag_service.get_embeddings = make_fake_backend(args.latency, args.per_item)
+    chunks = [f"chunk {i} " + "x" * (i % 97) for i in range(args.chunks)]
+
+    print(f"{'batch':>6} {'conc':>5} {'chunks/s':>10}")
+    for batch_size in (1, 16, 64):
+        for concurrency in (1, 4, 8):
+            if batch_size == 1 and concurrency == 1 and args.chunks > 64:
+                # послідовний шлях, як було раніше: рахуємо на підмножині
+                rate = asyncio.run(run_case(chunks[:64], batch_size, concurrency))
+            else:
+                rate = asyncio.run(run_case(chunks, batch_size, concurrency))
+            print(f"{batch_size:>6} {concurrency:>5} {rate:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Латентність чату під навантаженням від векторизації документів: пріоритетний
+планувальник проти звичайної черги FIFO.
+
+Gemini підмінено фейковим клієнтом з фіксованою затримкою; одночасно
+ганяються сотні батчів векторизації (смуга ingestion) і рідкі чатові
+запити (смуга chat), всі на одну модель з обмеженою паралельністю.
+Усе в одному процесі: між API і воркером пріоритети не діють, там чат
+захищають стелі WORKER_LLM_* (див. app/worker.py).
+
+    python -m benchmarks.llm_priority --embeds 400 --chats 40 --model-concurrency 4
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from types import SimpleNamespace
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services import llm_gateway as gateway_module
+from app.services import llm_scheduler as scheduler_module
+from app.services.llm_gateway import llm_gateway
+
+MODEL = "bench-model"
+
+
+def make_fake_client(latency: float):
+    async def embed_content(contents, **_):
+        await asyncio.sleep(latency)
+        return SimpleNamespace(embeddings=[SimpleNamespace(values=[0.0]) for _ in contents])
+
+    return SimpleNamespace(aio=SimpleNamespace(models=SimpleNamespace(embed_content=embed_content)))
+
+
+async def run_case(embeds: int, chats: int, chat_interval: float) -> list[float]:
+    async def chat_call(delay: float) -> float:
+        await asyncio.sleep(delay)
+        started = time.perf_counter()
+        await llm_gateway.embed(["user question"], model=MODEL, lane="chat")
+        return (time.perf_counter() - started) * 1000
+
+    ingestion = [
+        llm_gateway.embed(["chunk"] * 64, model=MODEL, lane="ingestion") for _ in range(embeds)
+    ]
+    chat_calls = [chat_call(i * chat_interval) for i in range(chats)]
+    results = await asyncio.gather(*chat_calls, *ingestion)
+    return results[:chats]
+
+
+def report(label: str, latencies: list[float]):
+    p95 = statistics.quantiles(latencies, n=20)[18]
+    print(f"{label:>9}: chat p50={statistics.median(latencies):8.1f}ms p95={p95:8.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--embeds", type=int, default=400)
+    parser.add_argument("--chats", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.05, help="секунд на виклик")
+    parser.add_argument("--chat-interval", type=float, default=0.05)
+    parser.add_argument("--model-concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    gateway_module.client = make_fake_client(args.latency)
+    settings.LLM_MAX_CONCURRENCY = args.model_concurrency
+    # смуги не обмежують, щоб порівнювати саме порядок видачі слотів моделі
+    settings.LLM_LANE_CONCURRENCY = {"chat": args.chats, "study": 1, "ingestion": args.embeds}
+
+    priorities = dict(scheduler_module.LANES)
+    for label, lanes in (("fifo", dict.fromkeys(priorities, 0)), ("priority", priorities)):
+        scheduler_module.LANES.update(lanes)
+        metrics.reset()
+        latencies = asyncio.run(run_case(args.embeds, args.chats, args.chat_interval))
+        report(label, latencies)
+        for key, timing in metrics.snapshot()["timings"].items():
+            if key.startswith("llm_queue_wait_seconds"):
+                print(f"  {key}: avg={timing['avg'] * 1000:.1f}ms max={timing['max'] * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
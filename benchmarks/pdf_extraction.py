@@ -0,0 +1,133 @@
+"""
+Час і пікова пам'ять (RSS) витягу тексту з синтетичного багатосторінкового PDF:
+послідовно в одному процесі проти пулу процесів.
+
+    python -m benchmarks.pdf_extraction --pages 400 --workers 4
+
+Кожен режим запускається в окремому підпроцесі, щоб ru_maxrss не змішувались.
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+LOREM = (
+    "Reciprocal rank fusion combines ranked lists from several retrieval systems. "
+    "Each document receives a score equal to the sum of reciprocal ranks. "
+)
+
+
+def make_pdf(path: Path, pages: int, lines_per_page: int = 45, padding_bytes: int = 0):
+    """
+    Мінімальний валідний PDF з текстом Helvetica на кожній сторінці.
+    padding_bytes додає непов'язаний бінарний потік, щоб роздути файл.
+    """
+    objects: list[bytes] = []
+    font_id = 3
+    page_ids = []
+    for page in range(pages):
+        text_ops = ["BT", "/F1 9 Tf", "11 TL", "40 800 Td"]
+        for line in range(lines_per_page):
+            content = f"Page {page + 1} line {line + 1}. {LOREM}"[:110]
+            text_ops.append(f"({content}) Tj T*")
+        text_ops.append("ET")
+        stream = "\n".join(text_ops).encode()
+        content_id = 4 + 2 * page
+        page_id = content_id + 1
+        page_ids.append(page_id)
+        objects.append(
+            f"{content_id} 0 obj\n<< /Length {len(stream)} >>\nstream\n".encode()
+            + stream
+            + b"\nendstream\nendobj\n"
+        )
+        objects.append(
+            f"{page_id} 0 obj\n<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {content_id} 0 R >>\n"
+            "endobj\n".encode()
+        )
+
+    if padding_bytes:
+        padding_id = 4 + 2 * pages
+        objects.append(
+            f"{padding_id} 0 obj\n<< /Length {padding_bytes} >>\nstream\n".encode()
+            + os.urandom(padding_bytes)
+            + b"\nendstream\nendobj\n"
+        )
+
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    head = [
+        b"1 0 obj\n<< /Type /Catalog /Pages 2 0 R >>\nendobj\n",
+        f"2 0 obj\n<< /Type /Pages /Kids [{kids}] /Count {pages} >>\nendobj\n".encode(),
+        b"3 0 obj\n<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>\nendobj\n",
+    ]
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for obj in head + objects:
+        offsets.append(len(out))
+        out += obj
+    xref_at = len(out)
+    out += f"xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(offsets) + 1} /Root 1 0 R >>\nstartxref\n{xref_at}\n%%EOF\n".encode()
+    path.write_bytes(bytes(out))
+
+
+def run_single(pdf: str, workers: int) -> dict:
+    from app.services.pdf_service import pdf_service
+
+    started = time.perf_counter()
+    pages = pdf_service.extract_pages(pdf, workers=workers)
+    elapsed = time.perf_counter() - started
+    assert [number for number, _ in pages] == list(range(1, len(pages) + 1))
+    if pdf_service._pool is not None:
+        # дочірні процеси потрапляють у RUSAGE_CHILDREN лише після завершення
+        pdf_service._pool.shutdown()
+
+    return {
+        "workers": workers,
+        "pages": len(pages),
+        "chars": sum(len(text) for _, text in pages),
+        "seconds": round(elapsed, 3),
+        "rss_self_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024,
+        "rss_child_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    parser.add_argument("--run-workers", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_single(args.run, args.run_workers)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = Path(tmp) / "synthetic.pdf"
+        make_pdf(pdf, args.pages)
+        print(f"{args.pages} pages, {pdf.stat().st_size // 1024} KB")
+
+        for workers in (0, args.workers):
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.pdf_extraction", "--run", str(pdf)]
+                + ["--run-workers", str(workers)],
+                check=True,
+                capture_output=True,
+                text=True,
+            )
+            print(out.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Кандидати для чату: повна сутність DocumentChunk (з embedding і tsvector)
+проти проекції (id, chunk_text, filename) - байти на запит і латентність p50/p95.
+
+Байти рахуються на боці Postgres через pg_column_size по кожній колонці,
+яку повертає запит. Потрібна робоча БД з міграціями (DATABASE_URL з .env);
+бенчмарк створює тимчасового користувача/проект/документ і видаляє їх після себе.
+
+    python -m benchmarks.retrieval_projection --chunks 5000 --queries 200
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from sqlalchemy import delete, literal_column, select
+from sqlalchemy.orm import joinedload, undefer
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal, engine
+from app.crud import chunk as crud_chunk
+from app.models.document import Document, DocumentChunk
+from app.models.user import User
+from app.services.retrieval_service import retrieval_service
+from benchmarks.chunk_write import create_document, make_rows
+
+LIMIT = retrieval_service.VECTOR_LIMIT
+
+FULL_COLUMNS = (
+    "document_chunks.id, document_chunks.chunk_index, document_chunks.page_number, "
+    "document_chunks.document_id, document_chunks.chunk_text, document_chunks.embedding, "
+    "document_chunks.content_tsvector, document.id, document.filename, document.file_path, "
+    "document.content_hash, document.project_id, document.processing_status, "
+    "document.created_at"
+)
+LEAN_COLUMNS = "document_chunks.id, document_chunks.chunk_text, document.filename"
+
+
+def random_vector() -> list[float]:
+    return [random.random() for _ in range(settings.EMBEDDING_DIM)]
+
+
+def full_stmt(project_id: int, query_vector):
+    # так виглядав запит до переходу на проекції
+    return (
+        select(DocumentChunk)
+        .options(
+            joinedload(DocumentChunk.document),
+            undefer(DocumentChunk.embedding),
+            undefer(DocumentChunk.content_tsvector),
+        )
+        .join(Document)
+        .filter(Document.project_id == project_id)
+        .order_by(DocumentChunk.embedding.l2_distance(query_vector))
+        .limit(LIMIT)
+    )
+
+
+def lean_stmt(project_id: int, query_vector):
+    return (
+        retrieval_service._candidate_columns()
+        .filter(Document.project_id == project_id)
+        .order_by(DocumentChunk.embedding.l2_distance(query_vector))
+        .limit(LIMIT)
+    )
+
+
+async def bytes_per_query(db, project_id: int, columns: str, query_vector) -> int:
+    sizes = " + ".join(f"coalesce(pg_column_size({c}), 0)" for c in columns.split(", "))
+    candidates = (
+        select(literal_column(sizes).label("size"))
+        .select_from(DocumentChunk)
+        .join(Document)
+        .filter(Document.project_id == project_id)
+        .order_by(DocumentChunk.embedding.l2_distance(query_vector))
+        .limit(LIMIT)
+        .subquery()
+    )
+    result = await db.execute(select(candidates.c.size))
+    return sum(result.scalars().all())
+
+
+async def run_mode(mode: str, project_id: int, queries) -> list[float]:
+    make_stmt = full_stmt if mode == "full" else lean_stmt
+    latencies = []
+    async with AsyncSessionLocal() as db:
+        for query_vector in queries:
+            started = time.perf_counter()
+            result = await db.execute(make_stmt(project_id, query_vector))
+            if mode == "full":
+                result.unique().scalars().all()
+            else:
+                result.all()
+            latencies.append((time.perf_counter() - started) * 1000)
+            # identity map не повинна заважати наступним запитам
+            db.expunge_all()
+    return latencies
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=5_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    engine.echo = False
+    user_id, document_id = await create_document()
+    try:
+        async with AsyncSessionLocal() as db:
+            for i in range(0, args.chunks, 500):
+                rows = make_rows(document_id, min(500, args.chunks - i))
+                rows = [(d, i + index, page, text, vec) for d, index, page, text, vec in rows]
+                await crud_chunk.write_chunks(db, rows)
+            project_id = await db.scalar(
+                select(Document.project_id).where(Document.id == document_id)
+            )
+
+        queries = [random_vector() for _ in range(args.queries)]
+        async with AsyncSessionLocal() as db:
+            full_bytes = await bytes_per_query(db, project_id, FULL_COLUMNS, queries[0])
+            lean_bytes = await bytes_per_query(db, project_id, LEAN_COLUMNS, queries[0])
+
+        for mode, size in (("full", full_bytes), ("lean", lean_bytes)):
+            latencies = await run_mode(mode, project_id, queries)
+            p95 = statistics.quantiles(latencies, n=20)[18]
+            print(
+                f"{mode:>5}: {size:8d} bytes/query "
+                f"p50={statistics.median(latencies):7.2f}ms p95={p95:7.2f}ms"
+            )
+    finally:
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(User).where(User.id == user_id))
+            await db.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+"""
+Латентність API під час паралельних великих завантажень.
+
+Поки N клієнтів одночасно вантажать PDF трохи менші за MAX_UPLOAD_SIZE_MB
+(за замовчуванням на UPLOAD_HEADROOM_MB менше), окремий клієнт раз на
+100 мс читає історію чату проекту (той самий event loop, що й чат).
+Порівнюються p50/p95 без завантажень і під навантаженням.
+
+Потрібен запущений сервер і токен користувача з проектом:
+
+    python -m benchmarks.upload_load --url http://localhost:8000 \\
+        --token <access_token> --project 1 --uploads 4 --size-mb 90
+
+Якщо сервер відхилив завантаження (наприклад, 413 через менший ліміт на сервері),
+бенчмарк завершується з помилкою: інакше він міряв би відмови, а не завантаження.
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from app.core.config import settings
+from benchmarks.pdf_extraction import make_pdf
+
+# запас під вміст сторінок і multipart, щоб файл точно пройшов ліміт
+UPLOAD_HEADROOM_MB = 10
+
+
+async def probe_latency(client: httpx.AsyncClient, path: str, stop: asyncio.Event) -> list[float]:
+    samples = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get(path)
+        samples.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0.1)
+    return samples
+
+
+def summary(samples: list[float]) -> str:
+    if len(samples) < 2:
+        return "no samples"
+    q = statistics.quantiles(samples, n=20)
+    return f"n={len(samples)} p50={statistics.median(samples):.1f}ms p95={q[18]:.1f}ms"
+
+
+async def upload(client: httpx.AsyncClient, path: str, pdf: Path, index: int) -> int:
+    with pdf.open("rb") as f:
+        response = await client.post(
+            path, files={"file": (f"load-{index}-{time.time_ns()}.pdf", f, "application/pdf")}
+        )
+    return response.status_code
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True)
+    parser.add_argument("--project", type=int, required=True)
+    parser.add_argument("--uploads", type=int, default=4)
+    parser.add_argument(
+        "--size-mb", type=int, default=max(1, settings.MAX_UPLOAD_SIZE_MB - UPLOAD_HEADROOM_MB)
+    )
+    parser.add_argument("--baseline-seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {args.token}"}
+    history = f"/projects/{args.project}/chat/history?limit=10"
+    documents = f"/projects/{args.project}/documents/"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = Path(tmp) / "big.pdf"
+        make_pdf(pdf, pages=50, padding_bytes=args.size_mb * 1024 * 1024)
+        if pdf.stat().st_size > settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024:
+            raise SystemExit(
+                f"{pdf.stat().st_size / 2**20:.1f} MB exceeds MAX_UPLOAD_SIZE_MB="
+                f"{settings.MAX_UPLOAD_SIZE_MB}, lower --size-mb"
+            )
+
+        async with httpx.AsyncClient(base_url=args.url, headers=headers, timeout=600) as client:
+            stop = asyncio.Event()
+            probe = asyncio.create_task(probe_latency(client, history, stop))
+            await asyncio.sleep(args.baseline_seconds)
+            stop.set()
+            baseline = await probe
+
+            stop = asyncio.Event()
+            probe = asyncio.create_task(probe_latency(client, history, stop))
+            started = time.perf_counter()
+            statuses = await asyncio.gather(
+                *(upload(client, documents, pdf, i) for i in range(args.uploads))
+            )
+            elapsed = time.perf_counter() - started
+            stop.set()
+            loaded = await probe
+
+    print(f"uploads: {statuses} in {elapsed:.1f}s")
+    rejected = [status for status in statuses if status >= 400]
+    if rejected:
+        raise SystemExit(f"{len(rejected)} uploads rejected ({rejected}), results are not valid")
+    print(f"baseline:     {summary(baseline)}")
+    print(f"under upload: {summary(loaded)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
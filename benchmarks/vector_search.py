@@ -0,0 +1,100 @@
+"""
+Латентність (p50/p95) і recall@5 HNSW-пошуку проти точного перебору.
+
+Створює тимчасову таблицю з випадковими векторами, будує на ній такий самий
+HNSW-індекс, як у міграції, і ганяє однакові запити в обох режимах.
+Потрібен Postgres з pgvector (DATABASE_URL з .env).
+
+    python -m benchmarks.vector_search --rows 100000 1000000 --queries 200
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import asyncpg
+import numpy as np
+from pgvector.asyncpg import register_vector
+
+from app.core.config import settings
+from app.core.db import ASYNC_DATABASE_URL
+
+TABLE = "bench_vector_search"
+DIM = 768
+TOP_K = 5
+
+
+async def fill_table(conn: asyncpg.Connection, rows: int):
+    await conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    await conn.execute(f"CREATE TABLE {TABLE} (id bigserial PRIMARY KEY, embedding vector({DIM}))")
+    rng = np.random.default_rng(42)
+    for start in range(0, rows, 10_000):
+        batch = rng.standard_normal((min(10_000, rows - start), DIM), dtype=np.float32)
+        await conn.copy_records_to_table(
+            TABLE, records=[(vector,) for vector in batch], columns=["embedding"]
+        )
+
+    started = time.perf_counter()
+    await conn.execute("SET maintenance_work_mem = '1GB'")
+    await conn.execute(
+        f"CREATE INDEX ON {TABLE} USING hnsw (embedding vector_l2_ops) "
+        "WITH (m = 16, ef_construction = 64)"
+    )
+    print(f"  index built in {time.perf_counter() - started:.1f}s")
+
+
+async def search(conn: asyncpg.Connection, queries, exact: bool, ef_search: int):
+    latencies, results = [], []
+    async with conn.transaction():
+        await conn.execute(f"SET LOCAL hnsw.ef_search = {ef_search}")
+        await conn.execute(f"SET LOCAL enable_indexscan = {'off' if exact else 'on'}")
+        for query in queries:
+            started = time.perf_counter()
+            rows = await conn.fetch(
+                f"SELECT id FROM {TABLE} ORDER BY embedding <-> $1 LIMIT {TOP_K}", query
+            )
+            latencies.append((time.perf_counter() - started) * 1000)
+            results.append({row["id"] for row in rows})
+    return latencies, results
+
+
+def report(label: str, latencies: list[float], recall: float | None = None):
+    p95 = statistics.quantiles(latencies, n=20)[18]
+    line = f"  {label:<16} p50={statistics.median(latencies):8.2f}ms p95={p95:8.2f}ms"
+    if recall is not None:
+        line += f" recall@{TOP_K}={recall:.3f}"
+    print(line)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[settings.HNSW_EF_SEARCH, 100])
+    args = parser.parse_args()
+
+    conn = await asyncpg.connect(ASYNC_DATABASE_URL.replace("postgresql+asyncpg", "postgresql"))
+    await register_vector(conn)
+    rng = np.random.default_rng(7)
+    queries = list(rng.standard_normal((args.queries, DIM), dtype=np.float32))
+
+    try:
+        for rows in args.rows:
+            print(f"{rows} rows")
+            await fill_table(conn, rows)
+            exact_latencies, truth = await search(conn, queries, exact=True, ef_search=40)
+            report("exact", exact_latencies)
+            for ef_search in args.ef_search:
+                latencies, found = await search(conn, queries, exact=False, ef_search=ef_search)
+                recall = statistics.mean(
+                    len(f & t) / TOP_K for f, t in zip(found, truth, strict=True)
+                )
+                report(f"hnsw ef={ef_search}", latencies, recall)
+    finally:
+        await conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,69 @@
+import pytest
+
+from app.core.config import settings
+from app.services.chat_service import ChatService
+
+HISTORY = [object()]
+
+
+@pytest.fixture(autouse=True)
+def heuristic_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_SKIP_REWRITE_HEURISTIC", True)
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "А детальніше?",
+        "А що з другим розділом підручника",
+        "А як це працює на практиці",
+        "поясни приклад з функцією вище: крок за кроком",
+        "Розкажи про третій пункт цього списку",
+        "Що було в останньому прикладі про замикання",
+        "Чому він повертає undefined у циклі",
+        "What about the second example from the lecture",
+    ],
+)
+def test_follow_up_is_rewritten(question):
+    assert ChatService._needs_rewrite(question, HISTORY)
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "Що таке замикання у JavaScript та навіщо потрібні замикання",
+        "Як працює збирач сміття в Python",
+        "Поясни різницю між TCP і UDP протоколами",
+        "What is a closure in JavaScript",
+    ],
+)
+def test_standalone_question_skips_rewrite(question):
+    assert not ChatService._needs_rewrite(question, HISTORY)
+
+
+def test_no_history_never_rewrites():
+    assert not ChatService._needs_rewrite("А детальніше?", [])
+
+
+def test_heuristic_disabled_always_rewrites_with_history(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_SKIP_REWRITE_HEURISTIC", False)
+    assert ChatService._needs_rewrite("Як працює збирач сміття в Python", HISTORY)
+
+
+@pytest.mark.parametrize(
+    ("question", "signal"),
+    [
+        ("А детальніше?", "marker"),
+        ("Розкажи про третій пункт цього списку", "marker"),
+        ("Що таке замикання", "short"),
+        ("Як працює збирач сміття в Python", None),
+    ],
+)
+def test_follow_up_signal(question, signal):
+    assert ChatService._follow_up_signal(question) == signal
+
+
+def test_self_contained_ignores_skip_rewrite_setting(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_SKIP_REWRITE_HEURISTIC", False)
+    assert ChatService._is_self_contained("Як працює збирач сміття в Python", HISTORY)
+    assert not ChatService._is_self_contained("А детальніше?", HISTORY)
@@ -0,0 +1,32 @@
+import pytest
+
+from app.schemas.study import KeyPointsResponse
+from app.services.study_service import StudyService
+
+service = StudyService()
+
+
+@pytest.mark.parametrize(
+    "result",
+    [
+        "Обробка помилок: try/except перехоплює Error і ValueError.",
+        "Кожна помилка логується перед повторною спробою.",
+    ],
+)
+def test_text_mentioning_errors_is_valid(result):
+    assert service._is_valid_result(result)
+
+
+@pytest.mark.parametrize(
+    "result",
+    [
+        "",
+        "   ",
+        StudyService.NO_TEXT_MESSAGE,
+        StudyService.NO_CONTEXT_MESSAGE,
+        StudyService.GENERATION_ERROR_MESSAGE,
+        KeyPointsResponse(points=[]),
+    ],
+)
+def test_fallback_is_invalid(result):
+    assert not service._is_valid_result(result)